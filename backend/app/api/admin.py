@@ -0,0 +1,71 @@
+import asyncio
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from app.core.auth import get_current_superuser
+from app.core.profiling import PROFILE_FORMATS, profiling
+from app.models.user import User
+from app.schemas.profiling import ProfileInfo, ProfileTriggerCreate, ProfileTriggerResponse
+from app.services.rag_service import EMBEDDING_MODEL
+from app.services.reindexer import reindexer
+
+router = APIRouter()
+
+# Arm profiling for the requests matching a path prefix
+@router.post("/admin/profiling/triggers", response_model=ProfileTriggerResponse)
+async def create_profile_trigger(
+    trigger: ProfileTriggerCreate,
+    current_user: User = Depends(get_current_superuser)
+):
+    if not profiling.available:
+        raise HTTPException(status_code=501, detail="Profiling needs pyinstrument, which is not installed")
+    return profiling.add_trigger(
+        path_prefix=trigger.path_prefix,
+        method=trigger.method,
+        sample_rate=trigger.sample_rate,
+        max_profiles=trigger.max_profiles,
+        expires_in_seconds=trigger.expires_in_seconds
+    )
+
+# List the armed triggers and how many profiles each has captured
+@router.get("/admin/profiling/triggers", response_model=List[ProfileTriggerResponse])
+async def get_profile_triggers(current_user: User = Depends(get_current_superuser)):
+    return profiling.list_triggers()
+
+# Disarm a trigger, the profiles it captured are kept
+@router.delete("/admin/profiling/triggers/{trigger_id}")
+async def delete_profile_trigger(trigger_id: str, current_user: User = Depends(get_current_superuser)):
+    if not profiling.remove_trigger(trigger_id):
+        raise HTTPException(status_code=404, detail="Trigger not found")
+    return {"message": "Trigger deleted"}
+
+# List the captured profiles, newest first
+@router.get("/admin/profiles", response_model=List[ProfileInfo])
+async def get_profiles(current_user: User = Depends(get_current_superuser)):
+    return await asyncio.to_thread(profiling.list_profiles)
+
+# One profile as an HTML call tree, plain text, or speedscope JSON (open it at speedscope.app for a flamegraph)
+@router.get("/admin/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("html", pattern="^(html|text|speedscope)$"),
+    current_user: User = Depends(get_current_superuser)
+):
+    try:
+        content = await asyncio.to_thread(profiling.render_profile, profile_id, format)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=content, media_type=PROFILE_FORMATS[format])
+
+# Delete a profile
+@router.delete("/admin/profiles/{profile_id}")
+async def delete_profile(profile_id: str, current_user: User = Depends(get_current_superuser)):
+    if not profiling.delete_profile(profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {"message": "Profile deleted"}
+
+# Progress of re-indexing the vector stores after a change of embedding model
+@router.get("/admin/reindex")
+async def get_reindex_status(current_user: User = Depends(get_current_superuser)):
+    with reindexer.lock:
+        stats = dict(reindexer.stats)
+    return {"embedding_model": EMBEDDING_MODEL, "running": reindexer.running, **stats}
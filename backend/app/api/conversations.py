@@ -1,90 +1,324 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+import logging
+import os
+import re
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import and_, delete, func, or_, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.db.search import (
+    MESSAGE_CJK_SEARCH_TABLE, MESSAGE_SEARCH_TABLE, build_match_query, build_substring_query, highlight_snippet, is_cjk_query
+)
+from app.db.session import get_async_db, is_sqlite
 from app.models.conversation import Conversation, Message
+from app.models.document import Document
 from app.schemas.conversation import (
     ConversationCreate,
+    ConversationDetail,
     ConversationResponse,
+    ConversationSummary,
+    ConversationSummaryPage,
     MessageCreate,
-    MessageResponse
+    MessagePage,
+    MessageResponse,
+    MessageSearchPage,
+    MessageSearchResult
 )
 from app.core.auth import get_current_user
+from app.core.conditional import is_not_modified, make_validators, not_modified_response
+from app.core.config import settings
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.paths import UPLOAD_ROOT
 from app.models.user import User
+from app.services.cancellation import TurnCancelled, run_turn
+from app.services.garbage_collector import garbage_collector
 from app.services.rag_service import rag_service
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+PREVIEW_LENGTH = 120
+# Set by the RAG service on the images it generates
+THUMBNAIL_ATTRIBUTE = re.compile(r'data-thumbnail="([^"]+)"')
+
+# Raise 404 unless the conversation exists and belongs to the user
+async def get_owned_conversation_id(db: AsyncSession, conversation_id: int, current_user: User) -> int:
+    result = await db.execute(
+        select(Conversation.id).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == current_user.id
+        )
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation_id
+
+# Same ownership check, returning the timestamp the response validators are derived from
+async def get_owned_conversation_updated_at(db: AsyncSession, conversation_id: int, current_user: User) -> datetime:
+    result = await db.execute(
+        select(Conversation.updated_at).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == current_user.id
+        )
+    )
+    updated_at = result.scalar_one_or_none()
+    if updated_at is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return updated_at
+
+# Mark the conversation as changed, so cached copies are revalidated and it sorts first in the list
+async def touch_conversation(db: AsyncSession, conversation_id: int, thumbnail_url: Optional[str] = None):
+    values = {"updated_at": datetime.utcnow()}
+    if thumbnail_url:
+        values["thumbnail_url"] = thumbnail_url
+    await db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(**values)
+    )
+
 # Create a new conversation
 @router.post("/conversations", response_model=ConversationResponse)
-def create_conversation(
+async def create_conversation(
     conversation: ConversationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     db_conversation = Conversation(
         title=conversation.title,
-        user_id=current_user.id
+        user_id=current_user.id,
+        messages=[]
     )
     db.add(db_conversation)
-    db.commit()
-    db.refresh(db_conversation)
+    await db.commit()
     return db_conversation
 
 # Get all conversations for the current user
 @router.get("/conversations", response_model=List[ConversationResponse])
-def get_conversations(
-    db: Session = Depends(get_db),
+async def get_conversations(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Conversation).filter(Conversation.user_id == current_user.id).all()
+    result = await db.execute(
+        select(Conversation)
+        .where(Conversation.user_id == current_user.id)
+        .options(selectinload(Conversation.messages))
+    )
+    return result.scalars().all()
+
+# Get one page of lightweight conversation summaries for the sidebar, most recently updated first
+@router.get("/conversations/summary", response_model=ConversationSummaryPage)
+async def get_conversation_summaries(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Count and latest message are correlated subqueries, so they are only evaluated for the rows of this page
+    message_count = (
+        select(func.count(Message.id))
+        .where(Message.conversation_id == Conversation.id)
+        .correlate(Conversation)
+        .scalar_subquery()
+    )
+    last_message_preview = (
+        select(func.substr(Message.content, 1, PREVIEW_LENGTH))
+        .where(Message.conversation_id == Conversation.id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(1)
+        .correlate(Conversation)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            Conversation.id,
+            Conversation.title,
+            Conversation.created_at,
+            Conversation.updated_at,
+            message_count.label("message_count"),
+            last_message_preview.label("last_message_preview"),
+            Conversation.thumbnail_url
+        )
+        .where(Conversation.user_id == current_user.id)
+        .order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        updated_at, conversation_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Conversation.updated_at < updated_at,
+            and_(Conversation.updated_at == updated_at, Conversation.id < conversation_id)
+        ))
+
+    rows = (await db.execute(query)).all()
+    items = [ConversationSummary.model_validate(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1].updated_at, items[-1].id)
+    return ConversationSummaryPage(items=items, next_cursor=next_cursor)
+
+# Full-text search over the current user's messages, best matches first
+@router.get("/conversations/search", response_model=MessageSearchPage)
+async def search_messages(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    if not is_sqlite(settings.DATABASE_URL):
+        raise HTTPException(status_code=501, detail="Search is only available with SQLite")
+    if is_cjk_query(q):
+        return await search_messages_by_substring(db, q, current_user.id, limit, offset)
+    match = build_match_query(q, current_user.id)
+    if match is None:
+        return MessageSearchPage(items=[])
+
+    # The owner term in the match already scopes results to the user, the join only adds the title
+    query = text(f"""
+        SELECT messages.id AS message_id, messages.conversation_id, conversations.title AS conversation_title,
+               messages.role, messages.created_at,
+               snippet({MESSAGE_SEARCH_TABLE}, 0, '**', '**', '...', 16) AS snippet
+        FROM {MESSAGE_SEARCH_TABLE}
+        JOIN messages ON messages.id = {MESSAGE_SEARCH_TABLE}.rowid
+        JOIN conversations ON conversations.id = messages.conversation_id
+        WHERE {MESSAGE_SEARCH_TABLE} MATCH :match
+        ORDER BY {MESSAGE_SEARCH_TABLE}.rank
+        LIMIT :limit OFFSET :offset
+    """).columns(created_at=Message.created_at.type)
+    rows = (await db.execute(query, {"match": match, "limit": limit + 1, "offset": offset})).all()
+    items = [MessageSearchResult.model_validate(row) for row in rows[:limit]]
+    next_offset = offset + limit if len(rows) > limit else None
+    return MessageSearchPage(items=items, next_offset=next_offset)
 
-# Get a specific conversation by ID
-@router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
-def get_conversation(
+# Chinese, Japanese or Korean search terms, found anywhere in a message, newest first
+async def search_messages_by_substring(db: AsyncSession, q: str, user_id: int, limit: int, offset: int) -> MessageSearchPage:
+    match, patterns = build_substring_query(q)
+    conditions = ["conversations.user_id = :user_id"]
+    params = {"user_id": user_id, "limit": limit + 1, "offset": offset}
+    if match is not None:
+        conditions.append(f"messages.id IN (SELECT rowid FROM {MESSAGE_CJK_SEARCH_TABLE} WHERE {MESSAGE_CJK_SEARCH_TABLE} MATCH :match)")
+        params["match"] = match
+    for i, pattern in enumerate(patterns):
+        conditions.append(f"messages.content LIKE :pattern{i} ESCAPE '\\'")
+        params[f"pattern{i}"] = pattern
+    query = text(f"""
+        SELECT messages.id AS message_id, messages.conversation_id, conversations.title AS conversation_title,
+               messages.role, messages.created_at, messages.content
+        FROM messages
+        JOIN conversations ON conversations.id = messages.conversation_id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY messages.created_at DESC, messages.id DESC
+        LIMIT :limit OFFSET :offset
+    """).columns(created_at=Message.created_at.type)
+    rows = (await db.execute(query, params)).all()
+    items = [
+        MessageSearchResult(
+            message_id=row.message_id,
+            conversation_id=row.conversation_id,
+            conversation_title=row.conversation_title,
+            role=row.role,
+            created_at=row.created_at,
+            snippet=highlight_snippet(row.content, q)
+        )
+        for row in rows[:limit]
+    ]
+    next_offset = offset + limit if len(rows) > limit else None
+    return MessageSearchPage(items=items, next_offset=next_offset)
+
+# Get a specific conversation by ID, its messages are fetched a page at a time from /messages
+@router.get("/conversations/{conversation_id}", response_model=ConversationDetail)
+async def get_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
+    # Check the client's copy before loading the conversation
+    updated_at = await get_owned_conversation_updated_at(db, conversation_id, current_user)
+    if settings.RAG_PREPARE_ON_OPEN:
+        # The user is likely to ask something next, open the store while they type
+        rag_service.prepare_conversation(str(conversation_id))
+    headers = make_validators(updated_at, "conversation")
+    if is_not_modified(request, headers):
+        return not_modified_response(headers)
+
+    result = await db.execute(
+        select(Conversation)
+        .where(Conversation.id == conversation_id, Conversation.user_id == current_user.id)
+    )
+    conversation = result.scalars().first()
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
+    response.headers.update(headers)
     return conversation
 
+# Get one page of a conversation's messages, walking backwards from the newest
+@router.get("/conversations/{conversation_id}/messages", response_model=MessagePage)
+async def get_messages(
+    conversation_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    updated_at = await get_owned_conversation_updated_at(db, conversation_id, current_user)
+    headers = make_validators(updated_at, "messages", limit, cursor)
+    if is_not_modified(request, headers):
+        return not_modified_response(headers)
+    response.headers.update(headers)
+
+    # Keyset on (created_at, id) served by ix_messages_conversation_created_id
+    query = select(Message).where(Message.conversation_id == conversation_id)
+    if cursor:
+        created_at, message_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Message.created_at < created_at,
+            and_(Message.created_at == created_at, Message.id < message_id)
+        ))
+    query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+    rows = (await db.execute(query)).scalars().all()
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+    # Return the page oldest first so it can be prepended to the chat as is
+    return MessagePage(items=list(reversed(page)), next_cursor=next_cursor)
+
 # Create a new message in a conversation
 @router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse)
 async def create_message(
     conversation_id: int,
     message: MessageCreate,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get conversation and verify ownership
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    # Verify ownership of the conversation
+    await get_owned_conversation_id(db, conversation_id, current_user)
 
-    # Create user message
+    # Create user message, it is written together with the answer in a single commit
     db_message = Message(
         content=message.content,
         role="user",
-        conversation_id=conversation_id
+        conversation_id=conversation_id,
+        created_at=datetime.utcnow()
+    )
+
+    # Get the tail of the conversation history, newest first from the index and then put back in order
+    result = await db.execute(
+        select(Message)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(settings.CHAT_HISTORY_MESSAGES)
     )
-    db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
-
-    # Get conversation history
-    history = db.query(Message).filter(
-        Message.conversation_id == conversation_id,
-        Message.id != db_message.id  # Exclude the current message
-    ).order_by(Message.created_at.asc()).all()
+    history = list(reversed(result.scalars().all()))
     
     # Format history for RAG service
     chat_history = [
@@ -92,75 +326,107 @@ async def create_message(
         for msg in history
     ]
 
+    # End the read transaction so the connection goes back to the pool while the model is generating
+    await db.commit()
+
+    is_image_generation = message.is_image_generation if hasattr(message, 'is_image_generation') else False
+    is_web_search = message.is_web_search if hasattr(message, 'is_web_search') else False
     try:
-        # Get response from RAG service
-        response_content = await rag_service.get_response(
-            conversation_id=str(conversation_id),
-            query=message.content,
-            chat_history=chat_history,
-            is_image_generation=message.is_image_generation if hasattr(message, 'is_image_generation') else False,
-            is_web_search=message.is_web_search if hasattr(message, 'is_web_search') else False
+        # Get response from RAG service, given up if the client leaves or sends another message first
+        response_content = await run_turn(
+            request,
+            conversation_id,
+            rag_service.get_response(
+                conversation_id=str(conversation_id),
+                query=message.content,
+                chat_history=chat_history,
+                is_image_generation=is_image_generation,
+                is_web_search=is_web_search
+            ),
+            mode="image" if is_image_generation else "web" if is_web_search else "rag"
         )
 
-        # Create assistant message
-        assistant_message = Message(
-            content=response_content,
-            role="assistant",
-            conversation_id=conversation_id
-        )
-        db.add(assistant_message)
-        db.commit()
-        db.refresh(assistant_message)
+    except TurnCancelled as e:
+        # Keep the question, nothing of the unfinished answer is stored
+        db.add(db_message)
+        await touch_conversation(db, conversation_id)
+        await db.commit()
+        if e.reason == "disconnect":
+            # Nobody is listening, 499 as in nginx's "client closed request" keeps it apart in the metrics
+            raise HTTPException(status_code=499, detail="Client disconnected")
+        raise HTTPException(status_code=409, detail="Cancelled by a newer message")
 
-        return assistant_message
     except Exception as e:
-        # Log the error and return a generic error message
-        print(f"Error generating response: {str(e)}")
+        # Log the error and return a generic error message, keeping the question in the history
+        logger.error(f"Error generating response: {str(e)}")
+        db.add(db_message)
+        await touch_conversation(db, conversation_id)
+        await db.commit()
         raise HTTPException(
             status_code=500,
             detail="An error occurred while generating the response"
         )
 
+    # Create assistant message, ids and timestamps are filled in by the flush so no refresh is needed
+    assistant_message = Message(
+        content=response_content,
+        role="assistant",
+        conversation_id=conversation_id
+    )
+    db.add_all([db_message, assistant_message])
+    # The conversation list shows the latest generated image
+    thumbnail = THUMBNAIL_ATTRIBUTE.search(response_content) if is_image_generation else None
+    await touch_conversation(db, conversation_id, thumbnail.group(1) if thumbnail else None)
+    await db.commit()
+
+    return assistant_message
+
 # Delete a conversation
 @router.delete("/conversations/{conversation_id}")
-def delete_conversation(
+async def delete_conversation(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+    await get_owned_conversation_id(db, conversation_id, current_user)
     
     # Clean up RAG resources before deleting the conversation
     try:
         rag_service.cleanup_conversation(str(conversation_id))
     except Exception as e:
-        print(f"Warning: Failed to clean up RAG resources for conversation {conversation_id}: {str(e)}")
+        logger.warning(f"Failed to clean up RAG resources for conversation {conversation_id}: {str(e)}")
     
-    db.delete(conversation)
-    db.commit()
+    # Delete with plain statements so the messages don't have to be loaded for the ORM cascade
+    stored_paths = (await db.scalars(
+        select(Document.stored_path).where(Document.conversation_id == conversation_id)
+    )).all()
+    await db.execute(delete(Document).where(Document.conversation_id == conversation_id))
+    await db.execute(delete(Message).where(Message.conversation_id == conversation_id))
+    await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+    await db.commit()
+
+    # Uploaded files are removed in the background once the rows are gone
+    for stored_path in stored_paths:
+        garbage_collector.enqueue(os.path.join(UPLOAD_ROOT, stored_path))
     return {"message": "Conversation deleted"}
 
 # Update the title of a conversation
 @router.put("/conversations/{conversation_id}", response_model=ConversationResponse)
-def update_conversation(
+async def update_conversation(
     conversation_id: int,
     conversation: ConversationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    db_conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Conversation)
+        .where(Conversation.id == conversation_id, Conversation.user_id == current_user.id)
+        .options(selectinload(Conversation.messages))
+    )
+    db_conversation = result.scalars().first()
     if not db_conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
     db_conversation.title = conversation.title
-    db.commit()
-    db.refresh(db_conversation)
+    await db.commit()
     return db_conversation 
\ No newline at end of file
@@ -1,14 +1,21 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_async_db
+from app.api.conversations import get_owned_conversation_id
 from app.core.auth import get_current_user
+from app.core.paths import UPLOAD_ROOT
+from app.models.document import Document
 from app.models.user import User
 from app.services.rag_service import rag_service
+import asyncio
+import logging
 import os
 import shutil
 import uuid
 import traceback
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # Upload a document to a conversation vector store
@@ -16,9 +23,11 @@ router = APIRouter()
 async def upload_document(
     file: UploadFile = File(...),
     conversation_id: int = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
+    await get_owned_conversation_id(db, conversation_id, current_user)
+
     try:
         # Validate file type
         if not file.filename.lower().endswith('.pdf'):
@@ -28,11 +37,10 @@ async def upload_document(
             )
 
         # Ensure Root directory exists
-        root_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'Root')
-        os.makedirs(root_dir, exist_ok=True)
+        os.makedirs(UPLOAD_ROOT, exist_ok=True)
 
         # Create user-specific directory if it doesn't exist
-        user_dir = os.path.join(root_dir, str(current_user.id))
+        user_dir = os.path.join(UPLOAD_ROOT, str(current_user.id))
         os.makedirs(user_dir, exist_ok=True)
 
         # Generate unique filename
@@ -45,20 +53,31 @@ async def upload_document(
             with open(file_path, "wb") as buffer:
                 shutil.copyfileobj(file.file, buffer)
 
-            # Process the document using RAG service
-            print(f"Processing document: {file_path}")
-            documents = rag_service.load_single_document(file_path, file.filename)
-            print(f"Document loaded, pages: {len(documents)}")
+            # Process the document using RAG service, in threads so concurrent uploads overlap
+            # (and identical ones share their embedding calls)
+            logger.info(f"Processing document: {file_path}")
+            documents = await asyncio.to_thread(rag_service.load_single_document, file_path, file.filename)
+            logger.info(f"Document loaded, pages: {len(documents)}")
             
-            chunks = rag_service.split_documents(documents)
-            print(f"Document split into chunks: {len(chunks)}")
+            chunks = await asyncio.to_thread(rag_service.split_documents, documents)
+            logger.info(f"Document split into chunks: {len(chunks)}")
             
             # Add chunks to conversation-specific vector store
-            rag_service.add_documents(str(conversation_id), chunks)
-            print("Chunks added to vector store")
+            await asyncio.to_thread(rag_service.add_documents, str(conversation_id), chunks)
+            logger.info("Chunks added to vector store")
+
+            # Record the upload so the file is removed along with its conversation
+            document = Document(
+                conversation_id=conversation_id,
+                user_id=current_user.id,
+                filename=file.filename,
+                stored_path=os.path.relpath(file_path, UPLOAD_ROOT)
+            )
+            db.add(document)
+            await db.commit()
             
             return {
-                "id": str(uuid.uuid4()),
+                "id": str(document.id),
                 "message": "File uploaded and processed successfully",
                 "filename": file.filename
             }
@@ -66,16 +85,14 @@ async def upload_document(
             # If processing fails, delete the uploaded file
             if os.path.exists(file_path):
                 os.remove(file_path)
-            print(f"Document processing error: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception(f"Document processing error: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail=f"Error processing document: {str(e)}\n{traceback.format_exc()}"
             )
 
     except Exception as e:
-        print(f"Upload error: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception(f"Upload error: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error uploading file: {str(e)}\n{traceback.format_exc()}"
@@ -85,7 +102,7 @@ async def upload_document(
 @router.get("/documents/test")
 async def test_vectorstore(
     conversation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
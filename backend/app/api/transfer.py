@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, select
+from app.core.auth import get_current_user
+from app.db.session import AsyncSessionLocal
+from app.models.conversation import Conversation, Message
+from app.models.user import User
+from app.services.rag_service import EMBEDDING_MODEL, rag_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Conversations, messages and vectors are exported as one JSON object per line:
+#   {"type": "export", "version": 1, "embedding_model": ...}
+#   {"type": "conversation", "id": ..., "title": ..., "created_at": ..., "updated_at": ...}
+#   {"type": "message", "conversation_id": ..., "role": ..., "content": ..., "created_at": ..., "updated_at": ...}
+#   {"type": "vector", "conversation_id": ..., "id": ..., "document": ..., "metadata": ..., "embedding": [...], "embedding_model": ...}
+# A vector's embedding_model is the model of its conversation's store, which until that store is
+# re-indexed can differ from the export's; older exports only have the one in the header.
+# Every conversation comes before the messages and vectors that refer to it, and the messages, then
+# the vectors, follow grouped by conversation in the order of the conversations.
+EXPORT_VERSION = 1
+EXPORT_BATCH_SIZE = 500  # Rows fetched from the cursor, and rows per insert on import
+VECTOR_BATCH_SIZE = 200
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+def to_line(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, default=lambda value: value.isoformat()) + "\n"
+
+async def export_lines(user_id: int, include_vectors: bool):
+    yield to_line({"type": "export", "version": EXPORT_VERSION, "embedding_model": EMBEDDING_MODEL})
+
+    # The response outlives request dependencies, so the generator owns its session
+    conversation_ids = []
+    async with AsyncSessionLocal() as db:
+        conversations = await db.stream(
+            select(Conversation.id, Conversation.title, Conversation.created_at, Conversation.updated_at)
+            .where(Conversation.user_id == user_id)
+            .order_by(Conversation.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for rows in conversations.partitions():
+            conversation_ids.extend(row.id for row in rows)
+            yield "".join(to_line({"type": "conversation", **row._asdict()}) for row in rows)
+
+        # Plain columns rather than ORM objects, so nothing accumulates in the session
+        messages = await db.stream(
+            select(Message.conversation_id, Message.role, Message.content, Message.created_at, Message.updated_at)
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(Conversation.user_id == user_id)
+            .order_by(Message.conversation_id, Message.created_at, Message.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for rows in messages.partitions():
+            yield "".join(to_line({"type": "message", **row._asdict()}) for row in rows)
+
+    if include_vectors:
+        for conversation_id in conversation_ids:
+            offset = 0
+            while True:
+                records = await asyncio.to_thread(
+                    rag_service.export_vectors, str(conversation_id), offset, VECTOR_BATCH_SIZE
+                )
+                if not records:
+                    break
+                yield "".join(to_line({"type": "vector", "conversation_id": conversation_id, **record}) for record in records)
+                offset += len(records)
+
+async def read_lines(request: Request):
+    """Yield (line number, parsed object) from an NDJSON body without buffering all of it"""
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        if len(buffer) > MAX_LINE_BYTES and b"\n" not in buffer:
+            raise HTTPException(status_code=413, detail=f"Line {line_number + 1} is too long")
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, parse_line(line, line_number)
+    if buffer.strip():
+        yield line_number + 1, parse_line(buffer, line_number + 1)
+
+def parse_line(line: bytes, line_number: int) -> dict:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Line {line_number} is not valid JSON")
+    if not isinstance(record, dict) or "type" not in record:
+        raise HTTPException(status_code=400, detail=f"Line {line_number} has no record type")
+    return record
+
+def parse_timestamp(value, line_number: int):
+    if value is None:
+        return datetime.utcnow()
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Line {line_number} has an invalid timestamp")
+
+# Export all of the current user's conversations as NDJSON
+@router.get("/transfer/export")
+async def export_conversations(
+    include_vectors: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    return StreamingResponse(
+        export_lines(current_user.id, include_vectors),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="conversations.ndjson"'}
+    )
+
+# Import conversations from an NDJSON export into the current user's account
+@router.post("/transfer/import")
+async def import_conversations(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    # Exported ids -> ids of the conversations created for them, in the order of the export
+    conversation_ids = {}
+    positions = {}  # New conversation id -> its place in the export
+    # How many conversations, from the start, have had all their lines
+    completed = 0
+    message_batch = []
+    vector_batch = []
+    vector_conversation_id = None
+    export_embedding_model = None
+    counts = {"conversations": 0, "messages": 0, "vectors": 0}
+
+    async with AsyncSessionLocal() as db:
+        # Each conversation and each batch of messages is committed on its own, so SQLite's
+        # write lock isn't held while vectors are re-embedded or the upload is still arriving
+        async def flush_messages():
+            if message_batch:
+                await db.execute(insert(Message), message_batch)
+                await db.commit()
+                counts["messages"] += len(message_batch)
+                message_batch.clear()
+
+        async def flush_vectors():
+            if vector_batch:
+                await asyncio.to_thread(rag_service.import_vectors, str(vector_conversation_id), list(vector_batch))
+                counts["vectors"] += len(vector_batch)
+                vector_batch.clear()
+
+        async def discard_incomplete():
+            for conversation_id in list(positions)[completed:]:
+                rag_service.cleanup_conversation(str(conversation_id))
+                await db.execute(delete(Message).where(Message.conversation_id == conversation_id))
+                await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+                await db.commit()
+
+        def new_conversation_id(record: dict, line_number: int) -> int:
+            nonlocal completed
+            if record.get("conversation_id") not in conversation_ids:
+                raise HTTPException(status_code=400, detail=f"Line {line_number} refers to an unknown conversation")
+            conversation_id = conversation_ids[record["conversation_id"]]
+            # A conversation taken for complete turned out not to be
+            completed = min(completed, positions[conversation_id])
+            return conversation_id
+
+        try:
+            async for line_number, record in read_lines(request):
+                if record["type"] == "export":
+                    if record.get("version") != EXPORT_VERSION:
+                        raise HTTPException(status_code=400, detail="Unsupported export version")
+                    export_embedding_model = record.get("embedding_model")
+                elif record["type"] == "conversation":
+                    conversation = Conversation(
+                        title=str(record.get("title") or "Imported conversation")[:255],
+                        user_id=current_user.id,
+                        created_at=parse_timestamp(record.get("created_at"), line_number),
+                        updated_at=parse_timestamp(record.get("updated_at"), line_number)
+                    )
+                    db.add(conversation)
+                    await db.flush()
+                    conversation_ids[record.get("id")] = conversation.id
+                    positions[conversation.id] = len(positions)
+                    db.expunge(conversation)
+                    await db.commit()
+                    counts["conversations"] += 1
+                elif record["type"] == "message":
+                    message_batch.append({
+                        "conversation_id": new_conversation_id(record, line_number),
+                        "role": record.get("role") if record.get("role") in ("user", "assistant") else "user",
+                        "content": str(record.get("content") or ""),
+                        "created_at": parse_timestamp(record.get("created_at"), line_number),
+                        "updated_at": parse_timestamp(record.get("updated_at"), line_number),
+                    })
+                    if len(message_batch) >= EXPORT_BATCH_SIZE:
+                        await flush_messages()
+                elif record["type"] == "vector":
+                    conversation_id = new_conversation_id(record, line_number)
+                    if not record.get("id") or not isinstance(record.get("document"), str):
+                        raise HTTPException(status_code=400, detail=f"Line {line_number} is not a valid vector")
+                    if conversation_id != vector_conversation_id or len(vector_batch) >= VECTOR_BATCH_SIZE:
+                        await flush_messages()
+                        await flush_vectors()
+                        vector_conversation_id = conversation_id
+                        # Vectors come last and grouped by conversation in export order, so the
+                        # conversations before this one have had all their lines
+                        completed = positions[conversation_id]
+                    # Vectors from another embedding model can't be mixed with ours, import_vectors re-embeds them
+                    record.setdefault("embedding_model", export_embedding_model)
+                    vector_batch.append(record)
+                else:
+                    raise HTTPException(status_code=400, detail=f"Line {line_number} has an unknown record type")
+
+            await flush_messages()
+            await flush_vectors()
+        except Exception as e:
+            await db.rollback()
+            # What was committed stays for the conversations that were imported in full
+            await discard_incomplete()
+            if isinstance(e, HTTPException):
+                raise
+            logger.error(f"Import error: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error importing conversations: {str(e)}")
+
+    return counts
@@ -1,24 +1,38 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.user import User
 from app.schemas.auth import TokenPayload
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-# Authenticate the user
-async def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# Users by token subject, so authenticated requests skip the database lookup
+user_cache = TTLCache(ttl=settings.USER_CACHE_TTL_SECONDS, max_size=settings.USER_CACHE_MAX_SIZE)
+# Already verified tokens -> subject, bounded by each token's own expiry
+token_cache = TTLCache(ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60, max_size=settings.TOKEN_CACHE_MAX_SIZE)
+
+def invalidate_user(email: str):
+    """Drop a cached user, call this after changing users with bulk UPDATE/DELETE statements"""
+    user_cache.invalidate(email)
+
+# Any ORM change to a user (deactivation, rename, password change, deletion) evicts it
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.email)
+    for old_email in inspect(target).attrs.email.history.deleted:
+        invalidate_user(old_email)
+
+# Decode and validate a token, returning its subject
+def get_token_subject(token: str, credentials_exception: HTTPException) -> str:
+    subject = token_cache.get(token)
+    if subject is not None:
+        return subject
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -28,10 +42,36 @@ async def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    token_cache.set(token, token_data.sub, expires_at=payload.get("exp"))
+    return token_data.sub
+
+# Authenticate the user
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme)
+) -> User:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    subject = get_token_subject(token, credentials_exception)
     
-    user = db.query(User).filter(User.email == token_data.sub).first()
-    if not user:
-        raise credentials_exception
+    user = user_cache.get(subject)
+    if user is None:
+        result = await db.execute(select(User).where(User.email == subject))
+        user = result.scalars().first()
+        if not user:
+            raise credentials_exception
+        # Cached users are shared between requests, so detach them from this request's session
+        db.expunge(user)
+        user_cache.set(subject, user)
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return user 
\ No newline at end of file
+    return user
+
+# Require an administrator
+async def get_current_superuser(current_user: User = Depends(get_current_user)) -> User:
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough privileges")
+    return current_user
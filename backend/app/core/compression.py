@@ -0,0 +1,14 @@
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import Receive, Scope, Send
+
+# Paths serving content that is already compressed (PNG images)
+UNCOMPRESSED_PREFIXES = ("/static/images/",)
+
+class CompressionMiddleware(GZipMiddleware):
+    """Gzip responses, except for files that wouldn't get any smaller"""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(UNCOMPRESSED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
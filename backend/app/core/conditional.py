@@ -0,0 +1,38 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+
+# Conditional GETs for conversation reads. Every change to a conversation or its messages
+# bumps Conversation.updated_at, so it is enough to validate the whole payload.
+
+def make_validators(updated_at: datetime, *variant) -> dict:
+    """ETag and Last-Modified headers for a response derived from a conversation.
+
+    `variant` distinguishes different representations of the same conversation,
+    e.g. the page size and cursor of a messages page.
+    """
+    key = "|".join(str(part) for part in (updated_at.isoformat(), *variant))
+    etag = f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]}"'
+    last_modified = format_datetime(updated_at.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+    # Clients may keep a copy but must revalidate before using it
+    return {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "private, no-cache"}
+
+def is_not_modified(request: Request, headers: dict) -> bool:
+    """Whether the client's cached copy is still current (If-None-Match takes precedence)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = headers["ETag"].removeprefix("W/")
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def not_modified_response(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
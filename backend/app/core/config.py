@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -14,9 +14,64 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 90
 
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12  # Existing hashes are upgraded on the next login when this changes
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Authentication caches (a size of 0 disables the cache)
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 1024
+    TOKEN_CACHE_MAX_SIZE: int = 4096
+
+    # Server Settings
+    WORKERS: int = 1  # Processes serving requests; with more than one, auto-reload is off
+
     # Database Settings
     DATABASE_URL: str
-    OPENAI_API_KEY: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # Derived from DATABASE_URL when not set
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    OPENAI_API_KEY: Optional[str] = None  # Only needed for image generation
+
+    # SQLite tuning applied to every new connection (ignored for other databases)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+
+    # Web Search Settings
+    SEARCH_URL: str = "https://html.duckduckgo.com/html/"  # DuckDuckGo HTML endpoint, or a compatible stand-in
+
+    # Chat Settings
+    CHAT_HISTORY_MESSAGES: int = 50  # Most recent messages passed to the model as history
+    RAG_WARM_UP: bool = True  # Load the model libraries in the background at startup rather than on the first chat
+    RAG_PREPARE_ON_OPEN: bool = True  # Set up a conversation's retriever in the background when it is opened
+    RAG_MAX_OPEN_CONVERSATIONS: int = 64  # Stores of the least recently used conversations are closed beyond this
+
+    # Embedding Settings
+    EMBEDDING_MODEL: str = "snowflake-arctic-embed2"  # e.g. "bge-m3:latest"; changing it re-indexes every conversation
+    REINDEX_ENABLED: bool = True
+    REINDEX_INTERVAL_SECONDS: int = 600  # How often to look for stores embedded with another model
+    REINDEX_BATCH_SIZE: int = 64  # Chunks embedded per call to the model
+    REINDEX_PAUSE_SECONDS: float = 0.5  # Between batches, so re-indexing leaves Ollama free for chat
+
+    # Vector Store Settings
+    FLAT_INDEX_MAX_CHUNKS: int = 2000  # Smaller stores are a flat index searched exhaustively, larger ones Chroma; 0 for Chroma only
+    FLAT_INDEX_DTYPE: str = "float16"  # Or "int8", half the size again at a small cost in precision
+
+    # Garbage Collection Settings
+    GC_SWEEP_ENABLED: bool = True  # Disable when pointing a throwaway database at a real data directory
+    GC_SWEEP_INTERVAL_SECONDS: int = 3600
+    GC_GRACE_SECONDS: int = 3600  # Files younger than this are never swept, so in-flight work is safe
+
+    # Profiling Settings (armed per request pattern by superusers, needs pyinstrument)
+    PROFILE_INTERVAL_SECONDS: float = 0.001  # Sampling interval
+    PROFILE_MAX_STORED: int = 100  # Oldest profiles are deleted beyond this
+
+    # Traffic Capture Settings (for benchmarks/replay_traffic.py)
+    TRAFFIC_CAPTURE_ENABLED: bool = False
+    TRAFFIC_CAPTURE_FILE: str = "traffic_capture.ndjson"  # Relative to the backend directory
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,60 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import IO, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows, where only a single worker is supported
+    fcntl = None
+
+# Locks held by the current thread, path -> shared flag, so nested calls don't deadlock on themselves
+_held = threading.local()
+
+def cross_process_locking() -> bool:
+    return fcntl is not None
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """Advisory lock on `path` shared by every worker process on the machine.
+
+    Exclusive by default, shared locks let readers in together. Re-entrant within a
+    thread: asking again for a lock the thread already holds (in the same mode, or
+    shared inside exclusive) passes straight through. Without fcntl this is a no-op.
+    """
+    held = getattr(_held, "locks", None)
+    if held is None:
+        held = _held.locks = {}
+    if path in held:
+        if held[path] and not shared:
+            raise RuntimeError(f"Cannot upgrade a shared lock to exclusive: {path}")
+        yield
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held[path] = shared
+        try:
+            yield
+        finally:
+            del held[path]
+            # Closing the file releases the lock
+
+def try_hold_lock(path: str) -> Optional[IO]:
+    """Take an exclusive lock without waiting and keep it until the returned file is closed.
+
+    Returns None if another process holds it. Used to pick one worker for jobs that
+    should only run once per machine.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    f = open(path, "a")
+    if fcntl is None:
+        return f
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
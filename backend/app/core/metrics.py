@@ -0,0 +1,77 @@
+import logging
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+
+logger = logging.getLogger(__name__)
+
+# Own registry, so /api/metrics only exposes what the application records
+registry = CollectorRegistry()
+
+# Seconds, from sub-millisecond splits to multi-minute document ingestion
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "chatai_stage_duration_seconds",
+    "Time spent in one stage of answering a request or ingesting a document",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+STAGE_ERRORS = Counter(
+    "chatai_stage_errors_total",
+    "Stages that ended with an exception",
+    ["stage"],
+    registry=registry,
+)
+REQUEST_SECONDS = Histogram(
+    "chatai_http_request_duration_seconds",
+    "HTTP request latency by handler",
+    ["method", "handler", "status"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+
+TURNS_CANCELLED = Counter(
+    "chatai_turns_cancelled_total",
+    "Answers abandoned before they were finished, because the client disconnected or sent a newer message",
+    ["reason", "mode"],
+    registry=registry,
+)
+TURN_CANCELLED_SECONDS = Histogram(
+    "chatai_turn_cancelled_seconds",
+    "How long an abandoned answer had been running, the model time it stopped holding",
+    ["reason", "mode"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "chatai_single_flight_calls_total",
+    "Upstream calls (search, page fetch, embedding) by whether they ran or joined an identical call in flight",
+    ["operation", "outcome"],
+    registry=registry,
+)
+
+def observe_stage(stage: str, elapsed: float, error: bool = False):
+    STAGE_SECONDS.labels(stage).observe(elapsed)
+    if error:
+        STAGE_ERRORS.labels(stage).inc()
+    logger.debug(f"stage={stage} elapsed={elapsed:.3f}s error={error}")
+
+@contextmanager
+def span(stage: str):
+    """Time the wrapped block as a stage, works around sync code and awaits alike"""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start, error)
+
+def render_metrics():
+    """Body and content type of the Prometheus text exposition"""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,11 @@
+import os
+
+# On-disk locations shared by the API, the RAG service and the garbage collector
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+UPLOAD_ROOT = os.path.join(BACKEND_DIR, 'Root')  # Uploaded PDFs, one directory per user id
+STATIC_DIR = os.path.join(BACKEND_DIR, 'static')
+IMAGES_DIR = os.path.join(STATIC_DIR, 'images')
+IMAGE_PROMPTS_DIR = os.path.join(BACKEND_DIR, 'image_prompts')  # Prompt key -> generated image, kept out of the public static mount
+VECTOR_DB_DIR = os.path.join(BACKEND_DIR, 'vector_db')
+PROFILES_DIR = os.path.join(BACKEND_DIR, 'profiles')  # Request profiles captured for administrators
+TURNS_DIR = os.path.join(BACKEND_DIR, 'turns')  # The turn each conversation is answering, so a newer message cancels an older one
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.paths import PROFILES_DIR
+from app.core.request_context import request_id_var
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer, SpeedscopeRenderer
+    from pyinstrument.session import Session
+except ImportError:  # Profiling is optional
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_RELOAD_SECONDS = 1.0  # How soon every worker sees a trigger added or removed through another one
+# Library frames kept in the text call tree (others are collapsed), so the time inside the chains is visible
+SHOW_LIBRARIES = r".*(langchain|chromadb|ollama|openai|trafilatura).*"
+VALID_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Output formats of a stored profile: HTML call tree, plain text, or speedscope JSON for a flamegraph
+PROFILE_FORMATS = {
+    "html": "text/html",
+    "text": "text/plain",
+    "speedscope": "application/json",
+}
+
+class ProfilingRegistry:
+    """Profiling triggers set by administrators and the profiles they captured.
+
+    Both live in one directory so every worker process sees them. A trigger profiles a
+    sample of the requests whose path starts with a prefix, up to a number of profiles;
+    the count is shared by claiming numbered files, which only one process can create.
+    With no trigger armed, checking a request costs a clock read.
+    """
+
+    def __init__(self, directory: str, interval: float, max_stored: int):
+        self.directory = directory
+        self.triggers_file = os.path.join(directory, "triggers.json")
+        self.claims_dir = os.path.join(directory, "claims")
+        self.interval = interval
+        self.max_stored = max_stored
+        self.triggers = []
+        self.exhausted = set()  # Trigger ids whose profiles have all been claimed
+        self.loaded_mtime = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return Profiler is not None
+
+    # Triggers
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self.checked_at < TRIGGER_RELOAD_SECONDS:
+            return
+        self.checked_at = now
+        try:
+            mtime = os.stat(self.triggers_file).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self.loaded_mtime:
+            self.triggers = self.read_triggers()
+            self.loaded_mtime = mtime
+
+    def read_triggers(self) -> List[dict]:
+        try:
+            with open(self.triggers_file) as f:
+                triggers = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return []
+        now = time.time()
+        return [trigger for trigger in triggers if trigger["expires_at"] > now]
+
+    def write_triggers(self, triggers: List[dict]):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.triggers_file}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(triggers, f)
+        os.replace(tmp_path, self.triggers_file)
+        self.checked_at = 0.0  # Pick the change up on the next request in this worker
+
+        # Claims of removed and expired triggers are no longer needed
+        active = {trigger["id"] for trigger in triggers}
+        for name in os.listdir(self.claims_dir) if os.path.isdir(self.claims_dir) else []:
+            if name.split(".")[0] not in active:
+                os.remove(os.path.join(self.claims_dir, name))
+
+    def add_trigger(self, path_prefix: str, method: Optional[str], sample_rate: float, max_profiles: int, expires_in_seconds: int) -> dict:
+        trigger = {
+            "id": uuid.uuid4().hex,
+            "path_prefix": path_prefix,
+            "method": method.upper() if method else None,
+            "sample_rate": sample_rate,
+            "max_profiles": max_profiles,
+            "expires_at": time.time() + expires_in_seconds,
+        }
+        with self.lock:
+            self.write_triggers(self.read_triggers() + [trigger])
+        logger.info(f"Profiling trigger {trigger['id']} armed for {trigger['method'] or '*'} {path_prefix}")
+        return self.describe_trigger(trigger)
+
+    def remove_trigger(self, trigger_id: str) -> bool:
+        with self.lock:
+            triggers = self.read_triggers()
+            remaining = [trigger for trigger in triggers if trigger["id"] != trigger_id]
+            if len(remaining) == len(triggers):
+                return False
+            self.write_triggers(remaining)
+        return True
+
+    def list_triggers(self) -> List[dict]:
+        return [self.describe_trigger(trigger) for trigger in self.read_triggers()]
+
+    def describe_trigger(self, trigger: dict) -> dict:
+        claimed = sum(
+            os.path.exists(os.path.join(self.claims_dir, f"{trigger['id']}.{slot}"))
+            for slot in range(trigger["max_profiles"])
+        )
+        return {**trigger, "expires_at": datetime.utcfromtimestamp(trigger["expires_at"]), "captured": claimed}
+
+    def match(self, method: str, path: str) -> Optional[dict]:
+        """The trigger that wants this request profiled, if any"""
+        self.refresh()
+        if not self.triggers or Profiler is None:
+            return None
+        now = time.time()
+        for trigger in self.triggers:
+            if trigger["expires_at"] <= now or trigger["id"] in self.exhausted:
+                continue
+            if trigger["method"] and trigger["method"] != method:
+                continue
+            if not path.startswith(trigger["path_prefix"]) or random.random() >= trigger["sample_rate"]:
+                continue
+            if self.claim(trigger):
+                return trigger
+        return None
+
+    def claim(self, trigger: dict) -> bool:
+        os.makedirs(self.claims_dir, exist_ok=True)
+        for slot in range(trigger["max_profiles"]):
+            try:
+                os.close(os.open(os.path.join(self.claims_dir, f"{trigger['id']}.{slot}"), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                continue
+        self.exhausted.add(trigger["id"])
+        return False
+
+    # Profiles
+
+    def profile_path(self, profile_id: str, extension: str) -> str:
+        if not VALID_ID.match(profile_id):
+            raise FileNotFoundError(profile_id)
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def save_profile(self, session, info: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        session.save(self.profile_path(info["id"], "pyisession"))
+        with open(self.profile_path(info["id"], "json"), "w") as f:
+            json.dump(info, f)
+        logger.info(f"Saved profile {info['id']} of {info['method']} {info['path']} ({info['duration_ms']} ms)")
+
+        # Keep only the newest profiles
+        for old in self.list_profiles()[self.max_stored:]:
+            self.delete_profile(old["id"])
+
+    def list_profiles(self) -> List[dict]:
+        profiles = []
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            if not name.endswith(".json") or name == "triggers.json":
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda info: info["created_at"], reverse=True)
+
+    def render_profile(self, profile_id: str, output_format: str) -> str:
+        session = Session.load(self.profile_path(profile_id, "pyisession"))
+        if output_format == "text":
+            return ConsoleRenderer(unicode=True, color=False, processor_options={"show_regex": SHOW_LIBRARIES}).render(session)
+        if output_format == "speedscope":
+            return SpeedscopeRenderer().render(session)
+        return HTMLRenderer().render(session)
+
+    def delete_profile(self, profile_id: str) -> bool:
+        found = False
+        for extension in ("json", "pyisession"):
+            try:
+                os.remove(self.profile_path(profile_id, extension))
+                found = True
+            except FileNotFoundError:
+                pass
+        return found
+
+profiling = ProfilingRegistry(
+    PROFILES_DIR,
+    interval=settings.PROFILE_INTERVAL_SECONDS,
+    max_stored=settings.PROFILE_MAX_STORED
+)
+
+class ProfilingMiddleware:
+    """Profile the requests an armed trigger selects with a sampling profiler (pyinstrument).
+
+    The profiler follows the request's task across awaits, so time spent waiting on
+    the model shows up as [await] under the chain call that waited.
+    """
+
+    def __init__(self, app: ASGIApp, registry: ProfilingRegistry = profiling):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        trigger = self.registry.match(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = Profiler(interval=self.registry.interval, async_mode="enabled")
+        created_at = datetime.utcnow()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session = profiler.stop()
+            info = {
+                "id": uuid.uuid4().hex,
+                "trigger_id": trigger["id"],
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round(session.duration * 1000, 1),
+                "cpu_ms": round(session.cpu_time * 1000, 1),
+                "samples": session.sample_count,
+                "request_id": request_id_var.get(),
+                "created_at": created_at.isoformat(),
+            }
+            try:
+                await asyncio.to_thread(self.registry.save_profile, session, info)
+            except Exception:
+                logger.exception("Failed to save profile")
@@ -0,0 +1,78 @@
+import logging
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import REQUEST_SECONDS
+
+# Correlation id of the request being handled. Context variables follow the request
+# into tasks and asyncio.to_thread calls, so every log line it causes carries the id.
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+REQUEST_ID_HEADER = "x-request-id"
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+def configure_logging(level: int = logging.INFO):
+    """Send the application's log records to stderr, tagged with the request id"""
+    logger = logging.getLogger("app")
+    if any(isinstance(f, RequestIdFilter) for handler in logger.handlers for f in handler.filters):
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+class RequestContextMiddleware:
+    """Assign each request a correlation id and record its latency.
+
+    A valid X-Request-ID sent by the client (or a proxy) is reused, otherwise a new one
+    is generated. It is echoed in the response headers.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode("latin-1"):
+                candidate = value.decode("latin-1")
+                if VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        status = 500
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.encode("latin-1"), request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by handler name rather than raw path, so ids in URLs don't explode the series count
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", None) or ("static" if scope["path"].startswith("/static/") else "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], handler, str(status)).observe(time.perf_counter() - start)
+            request_id_var.reset(token)
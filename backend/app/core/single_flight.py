@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+from app.core.metrics import SINGLE_FLIGHT_CALLS
+
+class SingleFlight:
+    """Collapses concurrent identical calls into one.
+
+    The first caller for a key makes the call, and callers arriving while it is in
+    flight wait for the same result or exception. Nothing is kept once the call
+    returns, so this only saves work when calls overlap, and results are never stale.
+
+    An async call runs as its own task, so one caller being cancelled doesn't cancel
+    it for the others; it is cancelled once every caller has gone.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.flights = {}  # key -> {"task": ..., "waiters": ...}, event loop only
+        self.thread_flights = {}  # key -> {"done": Event, "result": ..., "error": ...}
+        self.lock = threading.Lock()
+
+    def record(self, outcome: str):
+        SINGLE_FLIGHT_CALLS.labels(self.operation, outcome).inc()
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self.flights[key] = {"task": asyncio.ensure_future(call()), "waiters": 0}
+            flight["task"].add_done_callback(lambda _: self.forget(self.flights, key, flight))
+            self.record("executed")
+        else:
+            self.record("coalesced")
+
+        flight["waiters"] += 1
+        try:
+            return await asyncio.shield(flight["task"])
+        finally:
+            flight["waiters"] -= 1
+            if flight["waiters"] == 0 and not flight["task"].done():
+                # Forgotten first, so a caller arriving before the task unwinds starts a new call
+                self.forget(self.flights, key, flight)
+                flight["task"].cancel()
+
+    def run_sync(self, key: Hashable, call: Callable[[], Any]) -> Any:
+        """Blocking version, for calls made from worker threads"""
+        with self.lock:
+            flight = self.thread_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.thread_flights[key] = {"done": threading.Event(), "result": None, "error": None}
+        self.record("executed" if leader else "coalesced")
+
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["result"]
+
+        try:
+            flight["result"] = call()
+            return flight["result"]
+        except BaseException as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self.lock:
+                self.forget(self.thread_flights, key, flight)
+            flight["done"].set()
+
+    def forget(self, flights: dict, key: Hashable, flight: dict):
+        if flights.get(key) is flight:
+            del flights[key]
@@ -0,0 +1,26 @@
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+# Generated images are content-addressed, so a URL always refers to the same bytes
+IMMUTABLE_PREFIXES = ("images/",)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "no-cache"
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching for immutable assets.
+
+    Starlette already sends ETag and Last-Modified and answers conditional
+    requests with 304, this adds Cache-Control so browsers can skip the
+    revalidation entirely for generated images.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            normalized = path.replace("\\", "/").lstrip("/")
+            if normalized.startswith(IMMUTABLE_PREFIXES):
+                response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            else:
+                response.headers["Cache-Control"] = DEFAULT_CACHE_CONTROL
+        return response
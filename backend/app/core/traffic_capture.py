@@ -0,0 +1,221 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Endpoints whose traffic is recorded, with the route template written to the capture
+CAPTURED_ROUTES = [
+    (re.compile(r"^/api/conversations/(\d+)/messages$"), "/api/conversations/{conversation_id}/messages"),
+    (re.compile(r"^/api/documents/upload$"), "/api/documents/upload"),
+]
+
+MAX_JSON_BODY = 64 * 1024  # Larger JSON bodies are recorded by size only
+MAX_FIELD_VALUE = 1024
+
+def sanitize(value):
+    """Keep the shape of a JSON value but none of its text.
+
+    Strings become {"$chars": length}; numbers, booleans and nulls are kept so flags
+    like is_web_search survive.
+    """
+    if isinstance(value, str):
+        return {"$chars": len(value)}
+    if isinstance(value, dict):
+        return {key: sanitize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [sanitize(item) for item in value]
+    return value
+
+class MultipartShape:
+    """Streams a multipart body and keeps the field names, file types and sizes"""
+
+    def __init__(self, boundary: bytes):
+        self.parts = []
+        self.failed = False
+        self.header_field = b""
+        self.header_value = b""
+        self.headers = {}
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+        })
+
+    def on_part_begin(self):
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        part = {"name": options.get(b"name", b"").decode("latin-1"), "bytes": 0}
+        if b"filename" in options:
+            filename = options[b"filename"].decode("latin-1")
+            part["extension"] = os.path.splitext(filename)[1].lower()
+            part["content_type"] = self.headers.get(b"content-type", b"").decode("latin-1")
+        else:
+            part["value"] = b""
+        self.parts.append(part)
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        part = self.parts[-1]
+        part["bytes"] += end - start
+        if "value" in part and len(part["value"]) < MAX_FIELD_VALUE:
+            part["value"] += data[start:end]
+
+    def write(self, chunk: bytes):
+        # A malformed body is the endpoint's to reject, the capture just stops looking
+        if self.failed:
+            return
+        try:
+            self.parser.write(chunk)
+        except Exception:
+            self.failed = True
+
+class TrafficCaptureMiddleware:
+    """Record the shape and timing of message and document requests to an NDJSON file.
+
+    Opt-in (TRAFFIC_CAPTURE_ENABLED), for replaying the real traffic mix with
+    benchmarks/replay_traffic.py. Nothing identifying is written: message text is
+    reduced to its length, uploads to their type and size, and conversation ids to
+    an alias that is only stable within one process.
+    """
+
+    def __init__(self, app: ASGIApp, path: str):
+        self.app = app
+        self.path = path
+        self.lock = threading.Lock()
+        self.salt = secrets.token_bytes(16)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8", buffering=1)
+        logger.info(f"Capturing traffic to {path}")
+
+    def alias(self, conversation_id: str) -> str:
+        return hmac.new(self.salt, conversation_id.encode("utf-8"), hashlib.sha256).hexdigest()[:12]
+
+    def match(self, path: str):
+        for pattern, route in CAPTURED_ROUTES:
+            found = pattern.match(path)
+            if found:
+                return route, found.groups()[0] if found.groups() else None
+        return None, None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route, conversation_id = self.match(scope["path"])
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.lower(): value for name, value in scope["headers"]}
+        content_type, options = parse_options_header(headers.get(b"content-type", b""))
+        multipart: Optional[MultipartShape] = None
+        if content_type == b"multipart/form-data" and b"boundary" in options:
+            multipart = MultipartShape(options[b"boundary"])
+        body = bytearray()
+        request_bytes = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                request_bytes += len(chunk)
+                if multipart is not None:
+                    multipart.write(chunk)
+                elif len(body) <= MAX_JSON_BODY:
+                    body.extend(chunk)
+            return message
+
+        status, response_bytes = 500, 0
+        async def send_wrapper(message: Message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            try:
+                shape = self.describe_body(body, multipart, request_bytes)
+                if conversation_id:
+                    conversation = self.alias(conversation_id)
+                else:
+                    # Uploads name their conversation in a form field
+                    conversation = ((shape or {}).get("form") or {}).get("conversation_id")
+                self.record({
+                    "ts": round(started_at, 3),
+                    "method": scope["method"],
+                    "route": route,
+                    "conversation": conversation,
+                    "query": sanitize_query(scope.get("query_string", b"")),
+                    "body": shape,
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "request_bytes": request_bytes,
+                    "response_bytes": response_bytes,
+                })
+            except Exception:
+                # Capturing must never break the request it observes
+                logger.exception("Failed to record request")
+
+    def describe_body(self, body: bytearray, multipart: Optional[MultipartShape], size: int):
+        if multipart is not None:
+            fields, files = {}, []
+            for part in multipart.parts:
+                if "value" not in part:
+                    files.append({key: part[key] for key in ("name", "extension", "content_type", "bytes")})
+                elif part["name"] == "conversation_id":
+                    fields[part["name"]] = self.alias(part["value"].decode("latin-1"))
+                else:
+                    fields[part["name"]] = {"$chars": part["bytes"]}
+            return {"form": fields, "files": files}
+        if not size:
+            return None
+        if size > MAX_JSON_BODY:
+            return {"$bytes": size}
+        try:
+            return {"json": sanitize(json.loads(body))}
+        except ValueError:
+            return {"$bytes": size}
+
+    def record(self, entry: dict):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.lock:
+            self.file.write(line)
+
+def sanitize_query(query_string: bytes) -> dict:
+    # Page sizes are kept, opaque values like cursors only by length
+    return {
+        key: int(value) if value.isdigit() else {"$chars": len(value)}
+        for key, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    }
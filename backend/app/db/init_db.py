@@ -1,12 +1,37 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import Session
 from app.core.security import get_password_hash
 from app.models.base import Base
 from app.models.user import User
-from app.db.session import engine
+from app.models.conversation import Conversation, Message  # noqa: F401 (registers the tables)
+from app.models.document import Document  # noqa: F401
+from app.db.search import create_message_search_index
+from app.db.session import engine, is_sqlite
+from app.core.config import settings
 
 def init_db(db: Session) -> None:
     # Create tables
     Base.metadata.create_all(bind=engine)
+
+    # create_all skips existing tables, so add the nullable columns and the indexes introduced after they were created
+    inspector = inspect(engine)
+    add_column = "ADD" if engine.dialect.name == "mssql" else "ADD COLUMN"
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                with engine.begin() as connection:
+                    connection.execute(text(
+                        f"ALTER TABLE {table.name} {add_column} {column.name} {column.type.compile(dialect=engine.dialect)}"
+                    ))
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    # Full-text search over messages
+    if is_sqlite(settings.DATABASE_URL):
+        create_message_search_index(engine)
     
     # Create admin user
     admin = db.query(User).filter(User.email == "admin@example.com").first()
@@ -0,0 +1,147 @@
+import re
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# Full-text index over message content, SQLite FTS5 only.
+#
+# The index reads its text from a view rather than storing a copy of every message, and
+# also indexes an `owner` token per message ("u<user_id>"). Searches match on that token,
+# so FTS5 intersects the term doclists with the user's own instead of ranking every match
+# across all users and filtering afterwards.
+MESSAGE_SEARCH_TABLE = "messages_fts"
+
+# Chinese, Japanese and Korean are written without spaces, and unicode61 indexes a whole run of
+# them as one token, so a word inside a run can't be found there. Messages containing any of these
+# characters also go into a trigram index, searched by substring. Trigrams need three characters,
+# shorter terms are matched with LIKE on the user's own messages.
+MESSAGE_CJK_SEARCH_TABLE = "messages_cjk_fts"
+CJK_CHARACTERS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+CJK_PATTERN = re.compile(f"[{CJK_CHARACTERS}]")
+CJK_GLOB = f"*[{CJK_CHARACTERS}]*"
+TRIGRAM_MIN_LENGTH = 3
+SNIPPET_CONTEXT = 24  # Characters kept either side of the first match
+
+MESSAGE_SEARCH_DDL = [
+    """
+    CREATE VIEW IF NOT EXISTS messages_fts_source AS
+    SELECT messages.id AS id, messages.content AS content, 'u' || conversations.user_id AS owner
+    FROM messages JOIN conversations ON conversations.id = messages.conversation_id
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, owner,
+        content='messages_fts_source', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # Triggers keep the index in step with messages, whichever order rows are deleted in
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content, owner)
+        SELECT new.id, new.content, 'u' || user_id FROM conversations WHERE id = new.conversation_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content, owner)
+        SELECT 'delete', old.id, old.content, 'u' || user_id FROM conversations WHERE id = old.conversation_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content, owner)
+        SELECT 'delete', old.id, old.content, 'u' || user_id FROM conversations WHERE id = old.conversation_id;
+        INSERT INTO messages_fts(rowid, content, owner)
+        SELECT new.id, new.content, 'u' || user_id FROM conversations WHERE id = new.conversation_id;
+    END
+    """,
+    # Messages deleted after their conversation can no longer find their owner, so drop them here
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_conversation_delete AFTER DELETE ON conversations BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content, owner)
+        SELECT 'delete', messages.id, messages.content, 'u' || old.user_id FROM messages WHERE messages.conversation_id = old.id;
+    END
+    """,
+    # Content only, results are scoped to the user by joining their conversations
+    f"""
+    CREATE VIEW IF NOT EXISTS messages_cjk_fts_source AS
+    SELECT id, content FROM messages WHERE content GLOB '{CJK_GLOB}'
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_cjk_fts USING fts5(
+        content, content='messages_cjk_fts_source', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS messages_cjk_fts_insert AFTER INSERT ON messages
+    WHEN new.content GLOB '{CJK_GLOB}' BEGIN
+        INSERT INTO messages_cjk_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS messages_cjk_fts_delete AFTER DELETE ON messages
+    WHEN old.content GLOB '{CJK_GLOB}' BEGIN
+        INSERT INTO messages_cjk_fts(messages_cjk_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS messages_cjk_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_cjk_fts(messages_cjk_fts, rowid, content)
+        SELECT 'delete', old.id, old.content WHERE old.content GLOB '{CJK_GLOB}';
+        INSERT INTO messages_cjk_fts(rowid, content)
+        SELECT new.id, new.content WHERE new.content GLOB '{CJK_GLOB}';
+    END
+    """,
+]
+
+def create_message_search_index(engine: Engine) -> None:
+    """Create the FTS5 indexes and their triggers, indexing existing messages the first time"""
+    inspector = inspect(engine)
+    missing = [table for table in (MESSAGE_SEARCH_TABLE, MESSAGE_CJK_SEARCH_TABLE) if not inspector.has_table(table)]
+    with engine.begin() as connection:
+        for statement in MESSAGE_SEARCH_DDL:
+            connection.execute(text(statement))
+        # Only the content column counts towards relevance, every row of a user shares the owner token
+        connection.execute(text(f"INSERT INTO {MESSAGE_SEARCH_TABLE}({MESSAGE_SEARCH_TABLE}, rank) VALUES('rank', 'bm25(1.0, 0.0)')"))
+        for table in missing:
+            connection.execute(text(f"INSERT INTO {table}({table}) VALUES('rebuild')"))
+
+def is_cjk_query(query: str) -> bool:
+    return CJK_PATTERN.search(query) is not None
+
+def build_match_query(query: str, user_id: int):
+    """FTS5 query matching every term of the user's input in their own messages.
+
+    Terms are quoted, so operators and punctuation typed by the user are searched for
+    literally instead of being parsed as FTS5 syntax. Returns None if there is nothing to search.
+    """
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    if not terms:
+        return None
+    return f"owner : u{int(user_id)} AND content : ({' '.join(terms)})"
+
+
+def build_substring_query(query: str):
+    """Trigram match and LIKE patterns finding every term of the input anywhere in a message.
+
+    For queries with CJK characters. Returns (match, patterns), match is None when every term
+    is too short for the trigram index.
+    """
+    terms = query.split()
+    long_terms = ['"' + term.replace('"', '""') + '"' for term in terms if len(term) >= TRIGRAM_MIN_LENGTH]
+    patterns = [
+        "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        for term in terms if len(term) < TRIGRAM_MIN_LENGTH
+    ]
+    return (" ".join(long_terms) or None), patterns
+
+def highlight_snippet(content: str, query: str) -> str:
+    """The text around the first matching term, with every term wrapped in ** like FTS5's snippet()"""
+    terms = sorted(set(query.split()), key=len, reverse=True)
+    # Adjacent terms are highlighted together
+    pattern = re.compile("(?:" + "|".join(re.escape(term) for term in terms) + ")+", re.IGNORECASE)
+    first = pattern.search(content)
+    start = max(0, first.start() - SNIPPET_CONTEXT) if first else 0
+    end = min(len(content), (first.end() if first else 0) + SNIPPET_CONTEXT)
+    snippet = pattern.sub(lambda match: f"**{match.group(0)}**", content[start:end])
+    return ("..." if start > 0 else "") + snippet + ("..." if end < len(content) else "")
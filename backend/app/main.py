@@ -1,14 +1,40 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from app.api import auth, conversations, documents
+from app.api import admin, auth, conversations, documents, transfer
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
-import os
+from app.core.metrics import render_metrics
+from app.core.request_context import RequestContextMiddleware, configure_logging
+from app.core.static_files import CachedStaticFiles
+from app.core.paths import BACKEND_DIR, STATIC_DIR
+from app.core.profiling import ProfilingMiddleware
+from app.core.traffic_capture import TrafficCaptureMiddleware
+from app.services.garbage_collector import garbage_collector
+from app.services.rag_service import rag_service
+from app.services.reindexer import reindexer
+
+configure_logging()
+
+# Start and stop background workers with the application
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    garbage_collector.start()
+    reindexer.start()
+    if settings.RAG_WARM_UP:
+        # Not awaited, the API serves requests while the heavy imports load
+        app.state.warm_up = asyncio.create_task(asyncio.to_thread(rag_service.warm_up))
+    yield
+    reindexer.stop()
+    garbage_collector.stop()
 
 app = FastAPI(
     title="GPT Interface API",
     description="API for GPT Interface application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -18,18 +44,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Request-ID"],
 )
 
+# Compress JSON responses, long answers and source lists shrink several times
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
+# Sanitized request shapes and timings for replay, only when switched on
+if settings.TRAFFIC_CAPTURE_ENABLED:
+    app.add_middleware(TrafficCaptureMiddleware, path=os.path.join(BACKEND_DIR, settings.TRAFFIC_CAPTURE_FILE))
+
+# Sampling profiles of the requests a superuser asked for, a clock check per request otherwise
+app.add_middleware(ProfilingMiddleware)
+
+# Correlation id and latency of every request, outermost so it covers the other middleware
+app.add_middleware(RequestContextMiddleware)
+
 # # Mount static files directory
-static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIR), name="static")
 
 # Include routers
 app.include_router(auth.router, prefix="/api", tags=["auth"])
 app.include_router(conversations.router, prefix="/api", tags=["conversations"])
 app.include_router(documents.router, prefix="/api", tags=["documents"])
+app.include_router(transfer.router, prefix="/api", tags=["transfer"])
+app.include_router(admin.router, prefix="/api", tags=["admin"])
 # app.include_router(upload.router, prefix="/api", tags=["upload"])
 
 @app.get("/api/health")
 def health_check():
-    return {"status": "ok"} 
\ No newline at end of file
+    return {"status": "ok"} 
+
+# Prometheus scrape endpoint
+@app.get("/api/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
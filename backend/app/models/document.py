@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, ForeignKey
+from app.models.base import Base, TimestampMixin
+
+# Uploaded document, so the stored file can be cleaned up with its conversation
+class Document(Base, TimestampMixin):
+    __tablename__ = "documents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    filename = Column(String(255), nullable=False)  # Original name shown to the user
+    stored_path = Column(String(1024), nullable=False)  # Path relative to the upload root
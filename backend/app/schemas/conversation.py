@@ -19,6 +19,10 @@ class MessageResponse(MessageBase):
     class Config:
         from_attributes = True
 
+class MessagePage(BaseModel):
+    items: List[MessageResponse]
+    next_cursor: Optional[str] = None
+
 class ConversationBase(BaseModel):
     title: str
 
@@ -33,4 +37,45 @@ class ConversationResponse(ConversationBase):
     messages: List[MessageResponse] = []
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class ConversationDetail(ConversationBase):
+    """A conversation without its messages, which are paged through GET /conversations/{id}/messages"""
+    id: int
+    user_id: int
+    created_at: datetime
+    updated_at: datetime
+    thumbnail_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class ConversationSummary(ConversationBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
+    thumbnail_url: Optional[str] = None  # Of the latest generated image
+
+    class Config:
+        from_attributes = True
+
+class ConversationSummaryPage(BaseModel):
+    items: List[ConversationSummary]
+    next_cursor: Optional[str] = None
+
+class MessageSearchResult(BaseModel):
+    message_id: int
+    conversation_id: int
+    conversation_title: str
+    role: str
+    created_at: datetime
+    snippet: str  # Matching terms are wrapped in ** for highlighting
+
+    class Config:
+        from_attributes = True
+
+class MessageSearchPage(BaseModel):
+    items: List[MessageSearchResult]
+    next_offset: Optional[int] = None
\ No newline at end of file
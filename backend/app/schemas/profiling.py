@@ -0,0 +1,31 @@
+from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+class ProfileTriggerCreate(BaseModel):
+    path_prefix: str = "/api/"  # e.g. /api/conversations/42/messages for one conversation
+    method: Optional[str] = None  # Any method when not set
+    sample_rate: float = Field(1.0, gt=0, le=1)  # Fraction of matching requests profiled
+    max_profiles: int = Field(1, ge=1, le=100)
+    expires_in_seconds: int = Field(3600, ge=1, le=7 * 24 * 3600)
+
+class ProfileTriggerResponse(BaseModel):
+    id: str
+    path_prefix: str
+    method: Optional[str] = None
+    sample_rate: float
+    max_profiles: int
+    captured: int
+    expires_at: datetime
+
+class ProfileInfo(BaseModel):
+    id: str
+    trigger_id: str
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    cpu_ms: float
+    samples: int
+    request_id: str  # Matches the request id in the logs
+    created_at: datetime
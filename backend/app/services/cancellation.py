@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from fastapi import Request
+from app.core.metrics import TURNS_CANCELLED, TURN_CANCELLED_SECONDS
+from app.core.paths import TURNS_DIR
+
+logger = logging.getLogger(__name__)
+
+# How often an answer in progress checks whether it is still wanted
+TURN_POLL_SECONDS = 0.5
+
+
+class TurnCancelled(Exception):
+    """An answer was abandoned: the client went away ("disconnect") or asked something newer ("superseded")"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ActiveTurns:
+    """The turn each conversation is answering, as one small file per conversation.
+
+    Starting a turn overwrites the file, so an older turn still running in any worker
+    process sees it is no longer current the next time it checks.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, conversation_id: int) -> str:
+        return os.path.join(self.directory, str(conversation_id))
+
+    def start(self, conversation_id: int) -> str:
+        token = uuid.uuid4().hex
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path(conversation_id)}.{token}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(token)
+        os.replace(tmp_path, self.path(conversation_id))
+        return token
+
+    def is_current(self, conversation_id: int, token: str) -> bool:
+        try:
+            with open(self.path(conversation_id)) as f:
+                return f.read() == token
+        except FileNotFoundError:
+            return False
+
+    def finish(self, conversation_id: int, token: str):
+        # A newer turn's file is left for that turn to remove
+        if self.is_current(conversation_id, token):
+            try:
+                os.remove(self.path(conversation_id))
+            except FileNotFoundError:
+                pass
+
+
+active_turns = ActiveTurns(TURNS_DIR)
+
+
+async def run_turn(request: Request, conversation_id: int, answer, mode: str):
+    """Await the answer to a message, cancelling it if nobody will read it.
+
+    The answer runs as a task that is cancelled when the client disconnects or a newer
+    message for the conversation starts. Cancellation travels down every await, so the
+    HTTP calls to Ollama, the search engine and OpenAI are closed and the model stops
+    generating; work already handed to a thread finishes on its own. Raises TurnCancelled.
+    """
+    token = active_turns.start(conversation_id)
+    task = asyncio.ensure_future(answer)
+    start = time.monotonic()
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=TURN_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                reason = "disconnect"
+            elif not active_turns.is_current(conversation_id, token):
+                reason = "superseded"
+            else:
+                continue
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            elapsed = time.monotonic() - start
+            TURNS_CANCELLED.labels(reason, mode).inc()
+            TURN_CANCELLED_SECONDS.labels(reason, mode).observe(elapsed)
+            logger.info(f"Cancelled the {mode} answer in conversation {conversation_id} after {elapsed:.1f}s ({reason})")
+            raise TurnCancelled(reason)
+    finally:
+        # Also when we are cancelled ourselves, e.g. at shutdown
+        task.cancel()
+        active_turns.finish(conversation_id, token)
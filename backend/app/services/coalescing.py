@@ -0,0 +1,37 @@
+import hashlib
+from typing import List
+from langchain_core.embeddings import Embeddings
+from app.core.single_flight import SingleFlight
+
+# Shared by every model's client, keys include the model
+embedding_flights = SingleFlight("embed")
+
+def texts_key(model: str, kind: str, texts: List[str]) -> str:
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(hashlib.sha256(text.encode("utf-8")).digest())
+    return f"{model}:{kind}:{digest.hexdigest()}"
+
+class CoalescingEmbeddings(Embeddings):
+    """Embeddings wrapper making one call for identical batches requested at the same time,
+    e.g. the same PDF uploaded by several users or the same question asked at once"""
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        self.embeddings = embeddings
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        key = texts_key(self.model, "documents", texts)
+        return embedding_flights.run_sync(key, lambda: self.embeddings.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        key = texts_key(self.model, "query", [text])
+        return embedding_flights.run_sync(key, lambda: self.embeddings.embed_query(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        key = texts_key(self.model, "documents", texts)
+        return await embedding_flights.run(key, lambda: self.embeddings.aembed_documents(texts))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = texts_key(self.model, "query", [text])
+        return await embedding_flights.run(key, lambda: self.embeddings.aembed_query(text))
@@ -0,0 +1,49 @@
+import time
+from contextlib import contextmanager
+from app.core.metrics import observe_stage
+
+
+class Deadline:
+    """Time budget shared by every stage of a single request"""
+
+    def __init__(self, seconds: float):
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds
+        self.stages = {}  # Stage name -> accumulated seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the budget runs out (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float = None, reserve: float = 0.0) -> float:
+        """Timeout for the next stage, optionally capped and keeping `reserve` seconds for later stages"""
+        remaining = max(0.0, self.remaining() - reserve)
+        return remaining if cap is None else min(cap, remaining)
+
+    def record(self, name: str, elapsed: float, error: bool = False):
+        """Add elapsed time to a stage, concurrent stages accumulate their total"""
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+        observe_stage(name, elapsed, error)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the wrapped block as a named stage"""
+        start = time.monotonic()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, time.monotonic() - start, error)
+
+    def summary(self) -> str:
+        """One-line report of per-stage and total elapsed time"""
+        stages = ' '.join(f"{name}={elapsed:.2f}s" for name, elapsed in self.stages.items())
+        total = time.monotonic() - self.started
+        return f"{stages} total={total:.2f}s"
@@ -0,0 +1,210 @@
+import json
+import os
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+META_FILE = "flat_index.json"
+FLAT_DTYPES = ("float16", "int8")
+
+
+class FlatIndex:
+    """Embeddings of a small store as one quantized matrix on disk, searched exhaustively.
+
+    Vectors are normalized and kept as float16, or as int8 with a scale per row. The
+    matrix is memory-mapped, and the ids, texts and metadata sit next to it in a JSON
+    file that names the matrix, so replacing that file switches to a new matrix in one
+    step. Methods mirror the parts of a Chroma collection the RAG service uses.
+    """
+
+    def __init__(self, directory: str, dtype: str = "float16"):
+        if dtype not in FLAT_DTYPES:
+            raise ValueError(f"Unsupported flat index dtype: {dtype}")
+        self.directory = directory
+        self.dtype = dtype
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Optional[dict]] = []
+        self.positions: Dict[str, int] = {}
+        self.vectors = None  # (count, dimensions), memory-mapped
+        self.scales = None  # Per row, int8 only
+        self.files: List[str] = []
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def load(self):
+        try:
+            with open(os.path.join(self.directory, META_FILE)) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return
+        self.dtype = meta["dtype"]  # The one the index was written with
+        self.ids, self.documents, self.metadatas = meta["ids"], meta["documents"], meta["metadatas"]
+        self.positions = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.files = [meta["vectors"]] + ([meta["scales"]] if meta.get("scales") else [])
+        self.vectors = np.load(os.path.join(self.directory, meta["vectors"]), mmap_mode="r")
+        self.scales = np.load(os.path.join(self.directory, meta["scales"]), mmap_mode="r") if meta.get("scales") else None
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def quantize(self, embeddings) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        if self.dtype == "float16":
+            return matrix.astype(np.float16), None
+        peaks = np.abs(matrix).max(axis=1)
+        scales = np.where(peaks == 0, 1, peaks) / 127
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def dequantize(self, rows) -> np.ndarray:
+        matrix = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            matrix *= np.asarray(self.scales[rows])[:, None]
+        return matrix
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: Optional[List[Optional[dict]]] = None):
+        """Add chunks, replacing those with the same id, and write the index"""
+        new_vectors, new_scales = self.quantize(embeddings)
+        if self.vectors is None:
+            vectors = np.empty((0, new_vectors.shape[1]), dtype=new_vectors.dtype)
+            scales = np.empty(0, dtype=np.float32) if new_scales is not None else None
+        else:
+            vectors = np.array(self.vectors)
+            scales = np.array(self.scales) if self.scales is not None else None
+        ids_out, documents_out, metadatas_out = list(self.ids), list(self.documents), list(self.metadatas)
+        positions = dict(self.positions)
+
+        appended = []
+        for i, chunk_id in enumerate(ids):
+            metadata = metadatas[i] if metadatas else None
+            if chunk_id in positions:
+                row = positions[chunk_id]
+                vectors[row] = new_vectors[i]
+                if scales is not None:
+                    scales[row] = new_scales[i]
+                documents_out[row], metadatas_out[row] = documents[i], metadata
+            else:
+                positions[chunk_id] = len(ids_out)
+                ids_out.append(chunk_id)
+                documents_out.append(documents[i])
+                metadatas_out.append(metadata)
+                appended.append(i)
+        if appended:
+            vectors = np.concatenate([vectors, new_vectors[appended]])
+            if scales is not None:
+                scales = np.concatenate([scales, new_scales[appended]])
+
+        self.write(vectors, scales, ids_out, documents_out, metadatas_out)
+
+    def write(self, vectors: np.ndarray, scales: Optional[np.ndarray], ids, documents, metadatas):
+        token = uuid.uuid4().hex
+        meta = {"dtype": self.dtype, "vectors": f"vectors-{token}.npy", "scales": None, "ids": ids, "documents": documents, "metadatas": metadatas}
+        with open(os.path.join(self.directory, meta["vectors"]), "wb") as f:
+            np.save(f, vectors)
+        if scales is not None:
+            meta["scales"] = f"scales-{token}.npy"
+            with open(os.path.join(self.directory, meta["scales"]), "wb") as f:
+                np.save(f, scales)
+        meta_path = os.path.join(self.directory, META_FILE)
+        tmp_path = f"{meta_path}.{token}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+        previous = self.files
+        self.load()
+        # Maps already open on the old matrix keep working after it is unlinked
+        for name in previous:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def get(self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: Optional[int] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Chunks by id, or a page of them in insertion order, shaped like Chroma's results"""
+        include = ["documents", "metadatas"] if include is None else include
+        if ids is not None:
+            rows = [self.positions[chunk_id] for chunk_id in ids if chunk_id in self.positions]
+        else:
+            start = offset or 0
+            rows = list(range(start, self.count() if limit is None else min(start + limit, self.count())))
+        result = {"ids": [self.ids[row] for row in rows], "documents": None, "metadatas": None, "embeddings": None}
+        if "documents" in include:
+            result["documents"] = [self.documents[row] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[row] for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = self.dequantize(rows).tolist() if rows else []
+        return result
+
+    def query(self, embedding: List[float], k: int) -> List[Tuple[int, float]]:
+        """Rows of the k most similar chunks with their cosine similarity, best first"""
+        if not self.count() or k <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+        scores = np.asarray(self.vectors, dtype=np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+
+class FlatVectorStore(VectorStore):
+    """LangChain store over a FlatIndex, for conversations with a few hundred chunks.
+
+    Opening one reads a JSON file and maps a matrix, with none of the SQLite and HNSW
+    set-up of Chroma, and search is exact.
+    """
+
+    def __init__(self, directory: str, embedding_function: Embeddings, dtype: str = "float16"):
+        self._collection = FlatIndex(directory, dtype)
+        self._embedding_function = embedding_function
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        self._collection.upsert(ids, self._embedding_function.embed_documents(texts), texts, metadatas)
+        return ids
+
+    def get(self, ids: Optional[List[str]] = None, limit: Optional[int] = None, offset: Optional[int] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        return self._collection.get(ids=ids, limit=limit, offset=offset, include=include)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding_function.embed_query(query), k)
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        index = self._collection
+        return [
+            (Document(page_content=index.documents[row], metadata=index.metadatas[row] or {}, id=index.ids[row]), score)
+            for row, score in index.query(embedding, k)
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity, from -1 to 1
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, directory: Optional[str] = None, **kwargs: Any) -> "FlatVectorStore":
+        if directory is None:
+            raise ValueError("A flat index needs a directory")
+        store = cls(directory, embedding, kwargs.get("dtype", "float16"))
+        store.add_texts(texts, metadatas, kwargs.get("ids"))
+        return store
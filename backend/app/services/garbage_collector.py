@@ -0,0 +1,283 @@
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.file_lock import try_hold_lock
+from app.core.paths import BACKEND_DIR, IMAGE_PROMPTS_DIR, IMAGES_DIR, UPLOAD_ROOT, VECTOR_DB_DIR
+from app.db.session import SessionLocal
+from app.models.conversation import Conversation, Message
+from app.models.document import Document
+
+logger = logging.getLogger(__name__)
+
+# Suffix given to paths that have been deleted but not yet removed from disk
+TRASH_MARKER = ".deleted-"
+
+# Held by whichever worker process does the periodic sweeps
+SWEEP_LOCK_PATH = os.path.join(BACKEND_DIR, ".sweep.lock")
+
+# When uploads started being recorded in the documents table. Older uploads have no row
+# and their vector stores still point at them, so they are never swept
+UPLOADS_TRACKED_SINCE_PATH = os.path.join(BACKEND_DIR, ".uploads_tracked_since")
+
+# Generated image (or thumbnail) filenames referenced from message content
+IMAGE_REFERENCE = re.compile(r"/static/images/(?:thumbs/)?([^/\"'\s?]+)")
+
+
+def path_size(path: str) -> int:
+    """Bytes used by a file or directory tree"""
+    if not os.path.isdir(path) or os.path.islink(path):
+        return os.lstat(path).st_size
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class GarbageCollector:
+    """Deletes files in a background thread and periodically sweeps up files no row refers to"""
+
+    def __init__(self, sweep_interval: float, grace_seconds: float, sweep_enabled: bool = True):
+        self.sweep_interval = sweep_interval
+        self.sweep_enabled = sweep_enabled
+        self.grace_seconds = grace_seconds
+        self.jobs = queue.Queue()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.sweep_lock = None  # Held by the one worker process that sweeps
+        self.stats = {
+            "paths_removed": 0,
+            "bytes_reclaimed": 0,
+            "sweeps": 0,
+            "last_sweep_at": None,
+            "last_sweep_bytes": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Start the worker thread, which sweeps once right away and then every sweep_interval"""
+        if self.running:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name="garbage-collector", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Stop the worker, paths still queued are left renamed and picked up by the next sweep"""
+        if not self.running:
+            return
+        self.stopping.set()
+        self.jobs.put(None)
+        self.thread.join(timeout)
+
+    def discard(self, path: str):
+        """Move a path out of the way right away and delete it in the background"""
+        if not os.path.lexists(path):
+            return
+        trash_path = f"{path}{TRASH_MARKER}{uuid.uuid4().hex}"
+        try:
+            # A rename is cheap, and frees the original name for reuse immediately
+            os.rename(path, trash_path)
+        except OSError as e:
+            logger.info(f"Could not rename {path} for deletion: {str(e)}")
+            trash_path = path
+        self.enqueue(trash_path)
+
+    def enqueue(self, path: str):
+        """Queue a path for deletion, deleting inline when no worker is running (e.g. in scripts)"""
+        if self.running:
+            self.jobs.put(path)
+        else:
+            self.remove(path)
+
+    def remove(self, path: str) -> int:
+        """Delete a file or directory tree, returns the bytes reclaimed"""
+        try:
+            size = path_size(path)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.error(f"Error removing {path}: {str(e)}")
+            return 0
+        with self.lock:
+            self.stats["paths_removed"] += 1
+            self.stats["bytes_reclaimed"] += size
+        return size
+
+    def run(self):
+        next_sweep = time.monotonic()
+        while not self.stopping.is_set():
+            try:
+                path = self.jobs.get(timeout=max(0.0, next_sweep - time.monotonic()))
+            except queue.Empty:
+                if not self.sweep_enabled or not self.is_sweeper():
+                    next_sweep = time.monotonic() + self.sweep_interval
+                    continue
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.exception(f"Garbage collection sweep failed: {str(e)}")
+                next_sweep = time.monotonic() + self.sweep_interval
+                continue
+            if path is not None:
+                self.remove(path)
+
+    def is_sweeper(self) -> bool:
+        """With several workers only one sweeps, the others just delete what they discard"""
+        if self.sweep_lock is None:
+            self.sweep_lock = try_hold_lock(SWEEP_LOCK_PATH)
+        return self.sweep_lock is not None
+
+    def is_stale(self, path: str, cutoff: float) -> bool:
+        """Whether a path is older than the grace period, so nothing in flight can still be using it"""
+        try:
+            return os.lstat(path).st_mtime < cutoff
+        except FileNotFoundError:
+            return False
+
+    def list_dir(self, path: str):
+        try:
+            return sorted(os.listdir(path))
+        except FileNotFoundError:
+            return []
+
+    def uploads_tracked_since(self) -> float:
+        """Time from which every upload has a document row, recorded by the first sweep"""
+        try:
+            with open(UPLOADS_TRACKED_SINCE_PATH) as f:
+                return float(f.read())
+        except (FileNotFoundError, ValueError):
+            pass
+        # Only the sweeper gets here, so no other process writes the file at the same time
+        since = time.time()
+        tmp_path = f"{UPLOADS_TRACKED_SINCE_PATH}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(repr(since))
+        os.replace(tmp_path, UPLOADS_TRACKED_SINCE_PATH)
+        logger.info("Recorded the start of upload tracking, older uploads are never swept")
+        return since
+
+    def find_orphans(self):
+        """Paths on disk that no conversation, document or message refers to"""
+        db = SessionLocal()
+        try:
+            conversation_ids = {str(conversation_id) for conversation_id in db.scalars(select(Conversation.id))}
+            stored_paths = set(db.scalars(select(Document.stored_path)))
+            image_names = set()
+            for content in db.scalars(select(Message.content).where(Message.content.like("%/static/images/%"))):
+                image_names.update(IMAGE_REFERENCE.findall(content))
+        finally:
+            db.close()
+
+        cutoff = time.time() - self.grace_seconds
+        orphans = []
+
+        # Vector stores of conversations that no longer exist
+        for name in self.list_dir(VECTOR_DB_DIR):
+            path = os.path.join(VECTOR_DB_DIR, name)
+            if TRASH_MARKER in name:
+                orphans.append(path)
+            elif name.startswith("conversation_") and name[len("conversation_"):] not in conversation_ids:
+                if self.is_stale(path, cutoff):
+                    orphans.append(path)
+
+        # Uploaded files without a document row, among those uploaded since rows were recorded
+        tracked_since = self.uploads_tracked_since()
+        for user_dir in self.list_dir(UPLOAD_ROOT):
+            for name in self.list_dir(os.path.join(UPLOAD_ROOT, user_dir)):
+                path = os.path.join(UPLOAD_ROOT, user_dir, name)
+                if os.path.relpath(path, UPLOAD_ROOT) in stored_paths or not self.is_stale(path, cutoff):
+                    continue
+                try:
+                    if os.lstat(path).st_mtime >= tracked_since:
+                        orphans.append(path)
+                except FileNotFoundError:
+                    pass
+
+        # Images no message links to, and thumbnails of images that are gone. Images are
+        # content-addressed and shared between messages, so they are only ever swept here
+        removed_images = set()
+        for name in self.list_dir(IMAGES_DIR):
+            path = os.path.join(IMAGES_DIR, name)
+            if os.path.isdir(path) or name in image_names or not self.is_stale(path, cutoff):
+                continue
+            orphans.append(path)
+            removed_images.add(name)
+
+        thumbnails_dir = os.path.join(IMAGES_DIR, "thumbs")
+        for name in self.list_dir(thumbnails_dir):
+            path = os.path.join(thumbnails_dir, name)
+            image_gone = name in removed_images or not os.path.exists(os.path.join(IMAGES_DIR, name))
+            if (image_gone or name.endswith(".tmp")) and self.is_stale(path, cutoff):
+                orphans.append(path)
+
+        # Prompt cache entries pointing at removed images
+        for name in self.list_dir(IMAGE_PROMPTS_DIR):
+            path = os.path.join(IMAGE_PROMPTS_DIR, name)
+            if name.endswith(".tmp"):
+                if self.is_stale(path, cutoff):
+                    orphans.append(path)
+                continue
+            try:
+                with open(path, "r") as f:
+                    filename = f.read().strip()
+            except OSError:
+                continue
+            if filename in removed_images or not os.path.exists(os.path.join(IMAGES_DIR, filename)):
+                orphans.append(path)
+
+        # The prompt cache used to be kept under the static mount, where anyone could read it.
+        # Dropping it only means those prompts are generated once more
+        legacy_index_dir = os.path.join(IMAGES_DIR, "prompts")
+        if os.path.isdir(legacy_index_dir):
+            orphans.append(legacy_index_dir)
+
+        return orphans
+
+    def sweep(self) -> int:
+        """Remove every orphaned path, returns the bytes reclaimed"""
+        start = time.monotonic()
+        orphans = self.find_orphans()
+        reclaimed = sum(self.remove(path) for path in orphans)
+        with self.lock:
+            self.stats["sweeps"] += 1
+            self.stats["last_sweep_at"] = time.time()
+            self.stats["last_sweep_bytes"] = reclaimed
+        logger.info(
+            f"Garbage collection removed {len(orphans)} orphaned paths, reclaimed {format_bytes(reclaimed)} "
+            f"in {time.monotonic() - start:.2f}s (total {format_bytes(self.stats['bytes_reclaimed'])})"
+        )
+        return reclaimed
+
+
+garbage_collector = GarbageCollector(
+    settings.GC_SWEEP_INTERVAL_SECONDS,
+    settings.GC_GRACE_SECONDS,
+    sweep_enabled=settings.GC_SWEEP_ENABLED
+)
@@ -1,30 +1,42 @@
-from langchain_ollama import ChatOllama, OllamaEmbeddings
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_chroma import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+# langchain, chromadb, openai, trafilatura and bs4 take seconds to import, so they are imported
+# where they are first needed (or by warm_up) rather than here, and importing this module is cheap
 import re
 import os
-import traceback
-import shutil
+import asyncio
+import importlib
+import json
+import logging
 import base64
-from openai import OpenAI
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from functools import cached_property
 from dotenv import load_dotenv
 import uuid
-import requests
-from bs4 import BeautifulSoup
-import trafilatura
+try:
+    from PIL import Image
+except ImportError:  # Thumbnails are optional
+    Image = None
+from app.core.config import settings
+from app.core.file_lock import file_lock
+from app.core.metrics import span
+from app.core.paths import IMAGE_PROMPTS_DIR, IMAGES_DIR, STATIC_DIR, VECTOR_DB_DIR
+from app.core.single_flight import SingleFlight
+from app.services.deadline import Deadline
+from app.services.garbage_collector import garbage_collector
+
+logger = logging.getLogger(__name__)
 
 # Configuration - Exactly matching reference implementation
 MODEL_NAME = "llama3.2:latest"
 # MODEL_NAME = "gemma3:4b"
 # MODEL_NAME = "qwen2.5:3b"
 TEMPERATURE = 0.5
-EMBEDDING_MODEL = "snowflake-arctic-embed2"
-# EMBEDDING_MODEL = "bge-m3:latest"
+EMBEDDING_MODEL = settings.EMBEDDING_MODEL
+# Model of the stores written before each recorded the model it was built with
+LEGACY_EMBEDDING_MODEL = "snowflake-arctic-embed2"
 CHUNK_SIZE = 512
 CHUNK_OVERLAP = 50
 CHUNK_SIZE_L = 1024
@@ -33,6 +45,46 @@ CHUNK_OVERLAP_L = 100
 # ZH_CHUNK_OVERLAP_L = 75
 ZH_CHUNK_SIZE = 200
 ZH_CHUNK_OVERLAP = 30
+WEB_TOP_K = 6  # Number of scraped passages passed to the model for web search
+WEB_SEARCH_BUDGET = 30  # Seconds allowed for the whole web search path before generation
+WEB_INDEX_RESERVE = 5  # Seconds of the budget kept for indexing the scraped pages
+SEARCH_TIMEOUT = 10
+SCRAPE_TIMEOUT = 15
+IMAGE_MODEL = "dall-e-2"
+IMAGE_SIZE = "256x256"
+IMAGE_TIMEOUT = 60
+IMAGE_CONCURRENCY = 4  # Maximum DALL-E requests in flight per process
+PREPARE_CONCURRENCY = 2  # Conversations set up ahead of their first message at once, more are skipped
+THUMBNAIL_SIZE = (64, 64)
+# Kept in each conversation's vector directory: the lock every worker takes to write to the
+# store, and a token changed by each write so other workers know their copy is stale
+VECTOR_LOCK_FILE = ".lock"
+VECTOR_VERSION_FILE = ".version"
+# Also in there: a manifest naming the version directory reads and writes go to and the model its
+# embeddings came from, so a store can be rebuilt with another model next to the one in use
+VECTOR_MANIFEST_FILE = "manifest.json"
+VECTOR_VERSION_PREFIX = "v-"
+# Kinds of version: Chroma, or a quantized matrix searched exhaustively for small stores
+CHROMA_BACKEND = "chroma"
+FLAT_BACKEND = "flat"
+FLAT_INDEX_MAX_CHUNKS = settings.FLAT_INDEX_MAX_CHUNKS
+PROMOTE_BATCH_SIZE = 500  # Chunks per write when moving a flat index to Chroma
+
+# Imported by warm_up, the chat path first so it is ready soonest
+HEAVY_MODULES = [
+    "langchain_core.prompts",
+    "langchain_ollama",
+    "langchain.chains",
+    "langchain_chroma",
+    "app.services.flat_index",
+    "app.services.tracing",
+    "langchain_text_splitters",
+    "langchain_community.document_loaders",
+    "openai",
+    "requests",
+    "bs4",
+    "trafilatura",
+]
 
 load_dotenv()
 
@@ -81,20 +133,76 @@ class RAGService:
     def __init__(self):
         self.vectorstores = {}  # Dictionary to store vectorstores by conversation_id
         self.chains = {}  # Dictionary to store chains by conversation_id
-        self.embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL)
-        self.base_vector_path = os.path.join(os.path.dirname(__file__), '..', '..', 'vector_db')
-        self.openai_client = OpenAI()
+        self.vector_versions = {}  # conversation_id -> version of the store when it was opened
+        self.recently_used = OrderedDict()  # Conversations with an open store, least recently used first
+        self.in_use = Counter()  # conversation_id -> responses, writes and re-indexes in progress, never closed under them
+        self.open_lock = threading.Lock()
+        self.preparing = {}  # conversation_id -> background set-up task
+        self.embedding_clients = {}  # Embedding model -> client
+        self.base_vector_path = VECTOR_DB_DIR
+        self.warm_up_lock = threading.Lock()
+        self.warmed_up = False
+        self.image_semaphore = asyncio.Semaphore(IMAGE_CONCURRENCY)
+        # Identical searches and page fetches in flight at the same time are made once
+        self.search_flights = SingleFlight("search")
+        self.scrape_flights = SingleFlight("scrape")
         
         # Create static directory and its images subdirectory
-        static_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'static')
-        os.makedirs(static_dir, exist_ok=True)
-        self.images_dir = os.path.join(static_dir, 'images')
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        self.images_dir = IMAGES_DIR
         os.makedirs(self.images_dir, exist_ok=True)
+        # Prompt key -> content-addressed filename, and small previews for the conversation list
+        self.image_index_dir = IMAGE_PROMPTS_DIR
+        os.makedirs(self.image_index_dir, exist_ok=True)
+        self.thumbnails_dir = os.path.join(self.images_dir, 'thumbs')
+        os.makedirs(self.thumbnails_dir, exist_ok=True)
         
         # Create base vector store directory if it doesn't exist
         if not os.path.exists(self.base_vector_path):
             os.makedirs(self.base_vector_path)
 
+    @cached_property
+    def embeddings(self):
+        return self.embeddings_for(EMBEDDING_MODEL)
+
+    def embeddings_for(self, model: str):
+        """Embeddings client for a model, stores not yet re-indexed are still queried with their old one"""
+        if model not in self.embedding_clients:
+            from langchain_ollama import OllamaEmbeddings
+            from app.services.coalescing import CoalescingEmbeddings
+            from app.services.tracing import TimedEmbeddings
+            self.embedding_clients[model] = CoalescingEmbeddings(TimedEmbeddings(OllamaEmbeddings(model=model)), model)
+        return self.embedding_clients[model]
+
+    @cached_property
+    def openai_client(self):
+        # Built on first use, so a missing OPENAI_API_KEY only affects image generation
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(timeout=IMAGE_TIMEOUT)
+
+    def warm_up(self):
+        """Import the heavy dependencies and build the model clients ahead of the first request.
+
+        Blocking, run it in a thread. Failures are logged and left for the request that needs
+        the piece to report.
+        """
+        with self.warm_up_lock:
+            if self.warmed_up:
+                return
+            start = time.perf_counter()
+            for name in HEAVY_MODULES:
+                try:
+                    importlib.import_module(name)
+                except Exception as e:
+                    logger.warning(f"Warm-up could not import {name}: {e}")
+            for client in ("embeddings", "openai_client"):
+                try:
+                    getattr(self, client)
+                except Exception as e:
+                    logger.warning(f"Warm-up could not create {client}: {e}")
+            self.warmed_up = True
+            logger.info(f"RAG service warmed up in {time.perf_counter() - start:.2f}s")
+
     def detect_language(self, text):
         """Detect if text is primarily in Chinese"""
         chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
@@ -107,13 +215,16 @@ class RAGService:
         doc.metadata["doc_type"] = os.path.basename(os.path.dirname(filename))
         return doc
 
+    @span("load")
     def load_single_document(self, file_path, filename):
         """Load a single PDF document with robust error handling"""
         try:
-            print(f"Loading document from: {file_path}")
+            from langchain_community.document_loaders import PyPDFLoader
+
+            logger.info(f"Loading document from: {file_path}")
             loader = PyPDFLoader(file_path)
             documents = loader.load()
-            print(f"Document loaded successfully, pages: {len(documents)}")
+            logger.info(f"Document loaded successfully, pages: {len(documents)}")
             
             processed_docs = []
             for doc in documents:
@@ -124,23 +235,25 @@ class RAGService:
                 doc = self.add_metadata(doc, filename)
                 processed_docs.append(doc)
                 
-            print(f"Processed {len(processed_docs)} non-empty pages")
+            logger.info(f"Processed {len(processed_docs)} non-empty pages")
             return processed_docs
         except Exception as e:
             error_msg = f"Error loading document {filename}: {str(e)}"
-            print(error_msg)
-            print(traceback.format_exc())
+            logger.exception(error_msg)
             raise Exception(error_msg)
 
+    @span("split")
     def split_documents(self, documents):
         """Split documents into chunks based on language"""
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         try:
             # Group documents by language
             en_docs = [doc for doc in documents if doc.metadata.get("language") == "en"]
             zh_docs = [doc for doc in documents if doc.metadata.get("language") == "zh"]
             other_docs = [doc for doc in documents if doc.metadata.get("language") not in ["en", "zh"]]
             
-            print(f"Documents by language - EN: {len(en_docs)}, ZH: {len(zh_docs)}, Other: {len(other_docs)}")
+            logger.info(f"Documents by language - EN: {len(en_docs)}, ZH: {len(zh_docs)}, Other: {len(other_docs)}")
             # en_splitter = RecursiveCharacterTextSplitter(
             #         chunk_size=CHUNK_SIZE,
             #         chunk_overlap=CHUNK_OVERLAP,
@@ -189,27 +302,128 @@ class RAGService:
             return result_docs
         except Exception as e:
             error_msg = f"Error splitting documents: {str(e)}"
-            print(error_msg)
-            print(traceback.format_exc())
+            logger.exception(error_msg)
             raise Exception(error_msg)
 
     def get_conversation_vector_path(self, conversation_id: str) -> str:
         """Get the vector store path for a specific conversation"""
         return os.path.join(self.base_vector_path, f"conversation_{conversation_id}")
 
+    def vector_lock(self, conversation_id: str, shared: bool = False):
+        """Lock a conversation's vector store against the other worker processes"""
+        return file_lock(os.path.join(self.get_conversation_vector_path(conversation_id), VECTOR_LOCK_FILE), shared=shared)
+
+    def read_vector_version(self, conversation_id: str):
+        try:
+            with open(os.path.join(self.get_conversation_vector_path(conversation_id), VECTOR_VERSION_FILE)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def bump_vector_version(self, conversation_id: str):
+        """Record a write, call with the exclusive vector lock held"""
+        version = uuid.uuid4().hex
+        path = os.path.join(self.get_conversation_vector_path(conversation_id), VECTOR_VERSION_FILE)
+        self.write_file_atomic(path, version.encode("ascii"))
+        if conversation_id in self.vector_versions:
+            self.vector_versions[conversation_id] = version
+
+    def release_vectorstore(self, conversation_id: str):
+        """Forget this process's copy of a conversation's store and chains"""
+        with self.open_lock:
+            self.recently_used.pop(conversation_id, None)
+        self.vectorstores.pop(conversation_id, None)
+        self.chains.pop(conversation_id, None)
+        self.vector_versions.pop(conversation_id, None)
+        # Chroma keeps one client per directory for the life of the process, with the index loaded
+        # in memory; drop it so the next open reads what the other workers wrote
+        from chromadb.api.client import SharedSystemClient
+        directory = self.get_conversation_vector_path(conversation_id)
+        for path in list(SharedSystemClient._identifer_to_system):
+            if path == directory or path.startswith(directory + os.sep):
+                system = SharedSystemClient._identifer_to_system.pop(path, None)
+                if system is not None:
+                    system.stop()
+
+    def refresh_if_stale(self, conversation_id: str):
+        """Drop the cached store of a conversation another worker has written to since we opened it"""
+        if conversation_id in self.vector_versions and self.read_vector_version(conversation_id) != self.vector_versions[conversation_id]:
+            logger.info(f"Vector store for conversation {conversation_id} changed in another worker, reopening")
+            self.release_vectorstore(conversation_id)
+
+    def read_manifest(self, conversation_id: str):
+        try:
+            with open(os.path.join(self.get_conversation_vector_path(conversation_id), VECTOR_MANIFEST_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_manifest(self, conversation_id: str, version: str, model: str, backend: str):
+        """Point reads and writes at a version directory, call with the exclusive vector lock held"""
+        manifest = {"active": version, "model": model, "backend": backend}
+        path = os.path.join(self.get_conversation_vector_path(conversation_id), VECTOR_MANIFEST_FILE)
+        self.write_file_atomic(path, json.dumps(manifest).encode("utf-8"))
+
+    def new_vector_version(self, model: str) -> str:
+        """Name of a new version directory for a model"""
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", model).strip("-").lower()
+        return f"{VECTOR_VERSION_PREFIX}{slug}-{uuid.uuid4().hex[:8]}"
+
+    def new_store_backend(self, chunks: int = 0) -> str:
+        """Kind of version to build for a store of this many chunks"""
+        return FLAT_BACKEND if 0 < FLAT_INDEX_MAX_CHUNKS and chunks <= FLAT_INDEX_MAX_CHUNKS else CHROMA_BACKEND
+
+    def active_vector_store(self, conversation_id: str, create: bool = True):
+        """Directory, embedding model and backend of the version of the store in use.
+
+        A conversation without a store gets one for the current model, or (None, None, None) with create=False.
+        """
+        directory = self.get_conversation_vector_path(conversation_id)
+        manifest = self.read_manifest(conversation_id)
+        if manifest is None:
+            if os.path.exists(os.path.join(directory, "chroma.sqlite3")):
+                # Written before stores were versioned, in place
+                return directory, LEGACY_EMBEDDING_MODEL, CHROMA_BACKEND
+            if not create:
+                return None, None, None
+            with self.vector_lock(conversation_id):
+                manifest = self.read_manifest(conversation_id)
+                if manifest is None:
+                    version = self.new_vector_version(EMBEDDING_MODEL)
+                    self.write_manifest(conversation_id, version, EMBEDDING_MODEL, self.new_store_backend())
+                    manifest = self.read_manifest(conversation_id)
+        return os.path.join(directory, manifest["active"]), manifest["model"], manifest.get("backend", CHROMA_BACKEND)
+
+    def open_version(self, path: str, model: str, backend: str):
+        """Vector store of one version directory"""
+        if backend == FLAT_BACKEND:
+            from app.services.flat_index import FlatVectorStore
+            return FlatVectorStore(path, self.embeddings_for(model), dtype=settings.FLAT_INDEX_DTYPE)
+        from langchain_chroma import Chroma
+        return Chroma(persist_directory=path, embedding_function=self.embeddings_for(model))
+
+    def open_store(self, conversation_id: str):
+        """The conversation's store, loading its index while no worker is writing it"""
+        self.active_vector_store(conversation_id)  # A new store's manifest is written under the exclusive lock
+        with self.vector_lock(conversation_id, shared=True):
+            vectorstore = self.open_version(*self.active_vector_store(conversation_id))
+            self.vector_versions.setdefault(conversation_id, self.read_vector_version(conversation_id))
+        return vectorstore
+
     def setup_rag(self, conversation_id: str):
         """Initialize the RAG system for a specific conversation"""
-        vector_db_path = self.get_conversation_vector_path(conversation_id)
-        
+        from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+        from langchain.chains.combine_documents import create_stuff_documents_chain
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_ollama import ChatOllama
+        from app.services.tracing import CONDENSE_TAG, GENERATE_TAG
+
         try:
-            print(f"Setting up RAG for conversation {conversation_id}...")
+            logger.info(f"Setting up RAG for conversation {conversation_id}...")
             
             # Create vector store for this conversation
-            self.vectorstores[conversation_id] = Chroma(
-                persist_directory=vector_db_path,
-                embedding_function=self.embeddings
-            )
-            print(f"Vector store initialized for conversation {conversation_id}")
+            self.vectorstores[conversation_id] = self.open_store(conversation_id)
+            logger.info(f"Vector store initialized for conversation {conversation_id}")
 
             # Initialize LLM
             llm = ChatOllama(
@@ -267,7 +481,7 @@ class RAGService:
 
             # Create history-aware retriever
             history_aware_retriever = create_history_aware_retriever(
-                llm, retriever=retriever, prompt=condense_question_prompt
+                llm.with_config(tags=[CONDENSE_TAG]), retriever=retriever, prompt=condense_question_prompt
             )
 
             # Create document chains with prompts
@@ -376,60 +590,194 @@ class RAGService:
                 ("human", "{input}"),
             ])
 
-            en_document_chain = create_stuff_documents_chain(llm, en_prompt)
-            zh_document_chain = create_stuff_documents_chain(llm, zh_prompt)
+            en_document_chain = create_stuff_documents_chain(llm.with_config(tags=[GENERATE_TAG]), en_prompt)
+            zh_document_chain = create_stuff_documents_chain(llm.with_config(tags=[GENERATE_TAG]), zh_prompt)
             
             # Store chains for this conversation
             self.chains[conversation_id] = {
                 "en": create_retrieval_chain(history_aware_retriever, en_document_chain),
                 "zh": create_retrieval_chain(history_aware_retriever, zh_document_chain)
             }
+            self.touch(conversation_id)
             
         except Exception as e:
-            print(f"Error initializing RAG for conversation {conversation_id}: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception(f"Error initializing RAG for conversation {conversation_id}: {str(e)}")
             raise
 
+    def touch(self, conversation_id: str):
+        """Mark a conversation's store as used, closing the least recently used ones beyond RAG_MAX_OPEN_CONVERSATIONS"""
+        with self.open_lock:
+            self.recently_used[conversation_id] = None
+            self.recently_used.move_to_end(conversation_id)
+            idle = [cid for cid in self.recently_used if cid not in self.in_use and cid != conversation_id]
+            evicted = idle[:max(0, len(self.recently_used) - settings.RAG_MAX_OPEN_CONVERSATIONS)]
+        for cid in evicted:
+            logger.info(f"Closing the vector store of idle conversation {cid}")
+            self.release_vectorstore(cid)
+
+    @contextmanager
+    def using(self, conversation_id: str):
+        """Keep touch() from closing a conversation's store while it is read or written, from any thread"""
+        with self.open_lock:
+            self.in_use[conversation_id] += 1
+        try:
+            yield
+        finally:
+            with self.open_lock:
+                self.in_use[conversation_id] -= 1
+                if not self.in_use[conversation_id]:
+                    del self.in_use[conversation_id]
+
+    def prepare_conversation(self, conversation_id: str) -> bool:
+        """Set up a conversation's store and chains in the background, ahead of its first message.
+
+        Speculative, so it is skipped rather than queued when it would be wasted: the conversation
+        is ready or already being prepared, it has no documents, or PREPARE_CONCURRENCY set-ups
+        are running. Call from the event loop.
+        """
+        self.refresh_if_stale(conversation_id)
+        if conversation_id in self.chains or conversation_id in self.preparing:
+            return False
+        if len(self.preparing) >= PREPARE_CONCURRENCY or not os.path.exists(self.get_conversation_vector_path(conversation_id)):
+            return False
+        task = asyncio.create_task(self.prepare(conversation_id))
+        self.preparing[conversation_id] = task
+        task.add_done_callback(lambda _: self.preparing.pop(conversation_id, None))
+        return True
+
+    async def prepare(self, conversation_id: str):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.setup_rag, conversation_id)
+            logger.info(f"Prepared conversation {conversation_id} in {time.perf_counter() - start:.2f}s")
+        except Exception:
+            pass  # Logged by setup_rag, and reported again by the message that needs it
+
     def cleanup_conversation(self, conversation_id: str):
         """Clean up resources for a specific conversation"""
         try:
-            # Remove the vector store from memory
-            if conversation_id in self.vectorstores:
-                del self.vectorstores[conversation_id]
-            
-            # Remove the chains from memory
-            if conversation_id in self.chains:
-                del self.chains[conversation_id]
-            
-            # Remove the vector store directory
-            vector_db_path = self.get_conversation_vector_path(conversation_id)
-            if os.path.exists(vector_db_path):
-                shutil.rmtree(vector_db_path)
+            # Remove the vector store and chains from memory
+            self.release_vectorstore(conversation_id)
+            
+            # Removing the vector store directory is slow, leave it to the background collector
+            garbage_collector.discard(self.get_conversation_vector_path(conversation_id))
                 
-            print(f"Cleaned up resources for conversation {conversation_id}")
+            logger.info(f"Cleaned up resources for conversation {conversation_id}")
         except Exception as e:
-            print(f"Error cleaning up conversation {conversation_id}: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception(f"Error cleaning up conversation {conversation_id}: {str(e)}")
 
     def add_documents(self, conversation_id: str, documents):
         """Add documents to the vector store for a specific conversation"""
         try:
-            # Initialize RAG for this conversation if not already done
-            if conversation_id not in self.vectorstores:
-                self.setup_rag(conversation_id)
-            
             # Split documents if they haven't been split yet
             if hasattr(documents[0], 'page_content'):  # Check if documents need splitting
                 documents = self.split_documents(documents)
-            
-            return self.vectorstores[conversation_id].add_documents(documents)
+
+            # Embed before taking the lock, so other workers only wait for the write itself
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata or None for doc in documents]
+            _, model, _ = self.active_vector_store(conversation_id)
+            embeddings = self.embeddings_for(model).embed_documents(texts)
+            ids = [str(uuid.uuid4()) for _ in documents]
+
+            with self.using(conversation_id), self.vector_lock(conversation_id):
+                # Initialize RAG for this conversation if not already done, or reopen it if another worker wrote to it
+                self.refresh_if_stale(conversation_id)
+                self.promote_if_full(conversation_id, len(ids))
+                if conversation_id not in self.vectorstores:
+                    self.setup_rag(conversation_id)
+                _, active_model, _ = self.active_vector_store(conversation_id)
+                if active_model != model:
+                    # Re-indexed with another model while we were embedding
+                    embeddings = self.embeddings_for(active_model).embed_documents(texts)
+                self.vectorstores[conversation_id]._collection.upsert(
+                    ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas
+                )
+                self.bump_vector_version(conversation_id)
+            return ids
         except Exception as e:
-            print(f"Error adding documents for conversation {conversation_id}: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception(f"Error adding documents for conversation {conversation_id}: {str(e)}")
             raise Exception(f"Failed to add documents: {str(e)}")
 
+    def open_vectorstore(self, conversation_id: str):
+        """Vector store of a conversation, without building its chains"""
+        self.refresh_if_stale(conversation_id)
+        if conversation_id in self.vectorstores:
+            return self.vectorstores[conversation_id]
+        return self.open_store(conversation_id)
+
+    def promote_if_full(self, conversation_id: str, incoming: int):
+        """Move a flat index that would outgrow FLAT_INDEX_MAX_CHUNKS to Chroma, call with the exclusive vector lock held"""
+        path, model, backend = self.active_vector_store(conversation_id)
+        if backend != FLAT_BACKEND:
+            return
+        index = self.open_vectorstore(conversation_id)._collection
+        if index.count() + incoming <= FLAT_INDEX_MAX_CHUNKS:
+            return
+
+        version = self.new_vector_version(model)
+        target = self.open_version(os.path.join(self.get_conversation_vector_path(conversation_id), version), model, CHROMA_BACKEND)
+        for offset in range(0, index.count(), PROMOTE_BATCH_SIZE):
+            data = index.get(offset=offset, limit=PROMOTE_BATCH_SIZE, include=["documents", "metadatas", "embeddings"])
+            target._collection.upsert(
+                ids=data["ids"],
+                embeddings=data["embeddings"],
+                documents=data["documents"],
+                metadatas=[metadata or None for metadata in data["metadatas"]]
+            )
+        self.write_manifest(conversation_id, version, model, CHROMA_BACKEND)
+        self.bump_vector_version(conversation_id)
+        self.release_vectorstore(conversation_id)
+        garbage_collector.discard(path)
+        logger.info(f"Moved the vector store of conversation {conversation_id} to Chroma at {index.count()} chunks")
+
+    def export_vectors(self, conversation_id: str, offset: int, limit: int):
+        """One batch of a conversation's stored chunks with their embeddings"""
+        if conversation_id not in self.vectorstores and not os.path.exists(self.get_conversation_vector_path(conversation_id)):
+            return []
+        with self.using(conversation_id):
+            vectorstore = self.open_vectorstore(conversation_id)
+            _, model, _ = self.active_vector_store(conversation_id, create=False)
+            data = vectorstore.get(
+                offset=offset,
+                limit=limit,
+                include=["documents", "metadatas", "embeddings"]
+            )
+        return [
+            {
+                "id": data["ids"][i],
+                "document": data["documents"][i],
+                "metadata": data["metadatas"][i] or {},
+                "embedding": [float(value) for value in data["embeddings"][i]],
+                "embedding_model": model,
+            }
+            for i in range(len(data["ids"]))
+        ]
+
+    def import_vectors(self, conversation_id: str, records):
+        """Store exported chunks, keeping their embeddings when they came from the store's model"""
+        ids = [record["id"] for record in records]
+        texts = [record["document"] for record in records]
+        metadatas = [record.get("metadata") or None for record in records]
+        _, model, _ = self.active_vector_store(conversation_id)
+        if all(record.get("embedding") and record.get("embedding_model") == model for record in records):
+            embeddings = [record["embedding"] for record in records]
+        else:
+            embeddings = self.embeddings_for(model).embed_documents(texts)
+        with self.using(conversation_id), self.vector_lock(conversation_id):
+            self.promote_if_full(conversation_id, len(records))
+            self.open_vectorstore(conversation_id)._collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=metadatas
+            )
+            self.bump_vector_version(conversation_id)
+
     async def query_generator(self, query):
         """Generate a search query based on user input"""
+        from langchain_ollama import ChatOllama
+
         try:
             llm = ChatOllama(
                 temperature=0.1,  # Explicitly set low temperature for more deterministic results
@@ -457,25 +805,34 @@ class RAGService:
             # if len(words) > 6:  # Keep it concise as per the system message
             #     search_query = ' '.join(words[:6])
             
-            print(f"Generated search query: {search_query}")
+            logger.info(f"Generated search query: {search_query}")
             return search_query
         except Exception as e:
-            print(f"Error generating search query: {str(e)}")
+            logger.error(f"Error generating search query: {str(e)}")
             # Fall back to a very simple query based on the original
             simple_query = ' '.join(query.split()[:4])  # Just take first few words
             return simple_query
 
-    async def duckduckgo_search(self, query):
-        """Search DuckDuckGo for the query"""
-        print(f"Searching DuckDuckGo for: {query}")
+    def flight_key(self, text: str) -> str:
+        return ' '.join(text.casefold().split())
+
+    async def duckduckgo_search(self, query, timeout=SEARCH_TIMEOUT):
+        """Search DuckDuckGo for the query, sharing the results with the same search already in flight"""
+        return await self.search_flights.run(self.flight_key(query), lambda: self.fetch_search_results(query, timeout))
+
+    async def fetch_search_results(self, query, timeout=SEARCH_TIMEOUT):
+        logger.info(f"Searching DuckDuckGo for: {query}")
         try:
+            import requests
+            from bs4 import BeautifulSoup
+
             headers = {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36"
             }
-            url = f'https://html.duckduckgo.com/html/?q={query}'
-            
-            # Use a timeout to avoid hanging
-            response = requests.get(url, headers=headers, timeout=10)
+            # Use a timeout to avoid hanging, and keep the blocking request off the event loop
+            response = await asyncio.to_thread(
+                requests.get, settings.SEARCH_URL, params={'q': query}, headers=headers, timeout=timeout
+            )
             response.raise_for_status()
             
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -498,42 +855,54 @@ class RAGService:
                     'link': link,
                     'search_description': snippet
                 })
-                print(f"Found result #{i}: {link[:100]}...")
+                logger.info(f"Found result #{i}: {link[:100]}...")
 
-            print(f"Total results found: {len(results)}")
+            logger.info(f"Total results found: {len(results)}")
             return results
         except Exception as e:
-            print(f"Error searching DuckDuckGo: {str(e)}")
+            logger.error(f"Error searching DuckDuckGo: {str(e)}")
             return []
 
-    async def scrape_webpage(self, url):
-        """Scrape content from a webpage with timeout"""
-        print(f"Attempting to scrape webpage: {url}")
+    async def scrape_webpage(self, url, timeout=SCRAPE_TIMEOUT):
+        """Scrape content from a webpage with timeout, sharing the content with the same fetch already in flight"""
+        return await self.scrape_flights.run(url, lambda: self.fetch_webpage(url, timeout))
+
+    async def fetch_webpage(self, url, timeout=SCRAPE_TIMEOUT):
+        logger.info(f"Attempting to scrape webpage: {url}")
         try:
-            print("Downloading webpage content...")
-            # Use a shorter timeout for download
-            downloaded = trafilatura.fetch_url(url=url)
+            import trafilatura
+
+            logger.info("Downloading webpage content...")
+            # Download and extraction are blocking, run them in a thread and stop waiting at the timeout
+            downloaded = await asyncio.wait_for(asyncio.to_thread(trafilatura.fetch_url, url=url), timeout)
             if downloaded:
-                print("Successfully downloaded webpage")
-                content = trafilatura.extract(downloaded, include_formatting=True, include_links=True)
+                logger.info("Successfully downloaded webpage")
+                content = await asyncio.to_thread(
+                    trafilatura.extract, downloaded, include_formatting=True, include_links=True
+                )
                 if content:
                     if len(content) > 8000:  # Shorter content limit to avoid LLM context issues
                         content = content[:8000]
-                        print("Truncated content")
-                    print(f"Successfully extracted content (length: {len(content)} characters)")
+                        logger.info("Truncated content")
+                    logger.info(f"Successfully extracted content (length: {len(content)} characters)")
                     return content
                 else:
-                    print("Failed to extract content from webpage")
+                    logger.warning("Failed to extract content from webpage")
                     return None
             else:
-                print("Failed to download webpage")
+                logger.warning("Failed to download webpage")
                 return None
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out scraping webpage: {url}")
+            return None
         except Exception as e:
-            print(f"Error scraping webpage: {str(e)}")
+            logger.error(f"Error scraping webpage: {str(e)}")
             return None
 
     async def contains_data_needed(self, search_content, query, user_query):
         """Check if the search content contains relevant data for the query"""
+        from langchain_ollama import ChatOllama
+
         try:
             llm = ChatOllama(
                 temperature=0.1,
@@ -558,191 +927,350 @@ class RAGService:
             else:
                 return False
         except Exception as e:
-            print(f"Error checking if content contains data: {str(e)}")
+            logger.error(f"Error checking if content contains data: {str(e)}")
             # Default to True if there's an error, to be more inclusive
             return True
 
-    async def web_search(self, query):
-        """Perform web search and return relevant content"""
+    async def web_search(self, query, deadline=None):
+        """Perform web search and return the relevant pages as a list of {id, url, content} dicts"""
+        if deadline is None:
+            deadline = Deadline(WEB_SEARCH_BUDGET)
         try:
-            print('GENERATING SEARCH QUERY.')
+            logger.info('GENERATING SEARCH QUERY.')
             # Generate search query
-            search_query = await self.query_generator(query)
+            try:
+                with deadline.stage("query"):
+                    search_query = await asyncio.wait_for(
+                        self.query_generator(query), deadline.timeout(reserve=WEB_INDEX_RESERVE)
+                    )
+            except asyncio.TimeoutError:
+                logger.warning("Timed out generating search query - using the original query")
+                search_query = ' '.join(query.split()[:4])
             if not search_query:
-                print("Failed to generate search query")
+                logger.warning("Failed to generate search query")
                 return None
                 
             # Search DuckDuckGo
-            search_results = await self.duckduckgo_search(search_query)
+            with deadline.stage("search"):
+                search_results = await self.duckduckgo_search(
+                    search_query, timeout=deadline.timeout(cap=SEARCH_TIMEOUT, reserve=WEB_INDEX_RESERVE)
+                )
             if not search_results:
-                print("No search results found")
+                logger.info("No search results found")
                 return None
                 
-            contexts = []
-            checked_urls = set()
             max_sources = 5  # Increased to get more sources for better accuracy
-            
-            # Process results in order
+            urls = []
             for result in search_results:
-                if len(contexts) >= max_sources:
-                    break
+                if result['link'] not in urls:
+                    urls.append(result['link'])
                     
-                url = result['link']
-                if url in checked_urls:
-                    continue
-                    
-                checked_urls.add(url)
-                print(f"\nChecking source {len(contexts) + 1} of {max_sources}: {url}")
-                
-                # Skip certain domains that might have outdated information
-                # if any(domain in url.lower() for domain in ['wikipedia.org', 'archive.org']):
-                #     continue
-                
-                page_text = await self.scrape_webpage(url)
+            # Skip certain domains that might have outdated information
+            # urls = [url for url in urls if not any(domain in url.lower() for domain in ['wikipedia.org', 'archive.org'])]
+            
+            # Scrape and check every candidate concurrently, keyed by search rank
+            scraped = {}
+            relevant = {}
+            
+            async def process_source(rank, url):
+                logger.info(f"Checking source {rank + 1} of {len(urls)}: {url}")
+                start = asyncio.get_running_loop().time()
+                page_text = await self.scrape_webpage(
+                    url, timeout=deadline.timeout(cap=SCRAPE_TIMEOUT, reserve=WEB_INDEX_RESERVE)
+                )
+                deadline.record("scrape", asyncio.get_running_loop().time() - start)
                 if not page_text:
-                    continue
+                    return
+                scraped[rank] = page_text
+                
+                start = asyncio.get_running_loop().time()
+                relevant[rank] = await self.contains_data_needed(page_text, search_query, query)
+                deadline.record("relevance", asyncio.get_running_loop().time() - start)
+            
+            with deadline.stage("sources"):
+                tasks = [asyncio.create_task(process_source(rank, url)) for rank, url in enumerate(urls)]
+                try:
+                    _, pending = await asyncio.wait(tasks, timeout=deadline.timeout(reserve=WEB_INDEX_RESERVE))
+                finally:
+                    # Cancel stragglers once the budget runs out (or if we are cancelled ourselves)
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+            if pending:
+                logger.warning(f"Web search budget exhausted - cancelled {len(pending)} pending sources")
+            
+            # Build from whatever is ready, in search rank order
+            pages = []
+            for rank in sorted(scraped):
+                if len(pages) >= max_sources:
+                    break
                     
                 # Skip relevance check for the first source to ensure we get at least one result
-                if len(contexts) == 0 or await self.contains_data_needed(page_text, search_query, query):
-                    print("Source contains relevant information - adding to context")
-                    # Add timestamp if available in the page
-                    contexts.append(f"Source: {url}\n\n{page_text}")
+                if len(pages) == 0 or relevant.get(rank):
+                    logger.info(f"Source contains relevant information - adding to context: {urls[rank]}")
+                    pages.append({
+                        'id': len(pages) + 1,
+                        'url': urls[rank],
+                        'content': scraped[rank]
+                    })
                 else:
-                    print("Source does not contain relevant information - skipping")
+                    logger.info(f"Source does not contain relevant information - skipping: {urls[rank]}")
             
-            if contexts:
-                print(f'\nFound {len(contexts)} relevant sources')
-                return '\n\n---\n\n'.join(contexts)
+            if pages:
+                logger.info(f'Found {len(pages)} relevant sources')
+                return pages
             else:
-                print('\nNo relevant sources found')
+                logger.info('No relevant sources found')
                 return None
                 
         except Exception as e:
-            print(f"Error in web_search: {type(e).__name__}: {str(e)}")
+            logger.error(f"Error in web_search: {type(e).__name__}: {str(e)}")
             return None
 
+    async def retrieve_web_passages(self, query, pages, deadline=None):
+        """Index scraped pages in a short-lived in-memory store and return the passages most relevant to the query"""
+        from langchain_core.documents import Document
+        from langchain_core.vectorstores import InMemoryVectorStore
+
+        if deadline is None:
+            deadline = Deadline(WEB_INDEX_RESERVE)
+        documents = [
+            Document(
+                page_content=page['content'],
+                metadata={
+                    "source": page['url'],
+                    "source_id": page['id'],
+                    "language": self.detect_language(page['content'])
+                }
+            )
+            for page in pages
+        ]
+        chunks = self.split_documents(documents)
+        logger.info(f"Split {len(pages)} web pages into {len(chunks)} passages")
+
+        try:
+            # The index only lives for this request, so it is dropped as soon as we return
+            index = InMemoryVectorStore(self.embeddings)
+            with deadline.stage("index"):
+                await asyncio.wait_for(index.aadd_documents(chunks), deadline.timeout())
+                passages = await asyncio.wait_for(index.asimilarity_search(query, k=WEB_TOP_K), deadline.timeout())
+        except Exception as e:
+            # Fall back to the opening passages of the pages rather than failing the search
+            logger.error(f"Error indexing web passages: {type(e).__name__}: {str(e)}")
+            passages = chunks[:WEB_TOP_K]
+
+        # Keep passages in source order so the model reads each page's excerpts together
+        passages.sort(key=lambda doc: doc.metadata["source_id"])
+        return passages
+
+    def format_web_passages(self, passages):
+        """Build the search results context and the ordered list of cited source URLs"""
+        sources = []
+        blocks = []
+        for doc in passages:
+            url = doc.metadata["source"]
+            if url not in sources:
+                sources.append(url)
+            blocks.append(f"[{sources.index(url) + 1}] {doc.page_content}")
+        return '\n\n---\n\n'.join(blocks), sources
+
+    def image_cache_key(self, prompt: str, model: str = IMAGE_MODEL, size: str = IMAGE_SIZE) -> str:
+        """Key identifying an image request, insensitive to case and whitespace in the prompt"""
+        normalized = ' '.join(prompt.casefold().split())
+        return hashlib.sha256(f"{model}\n{size}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def write_file_atomic(self, path: str, data: bytes):
+        """Write a file so readers never see a partial image"""
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def lookup_cached_image(self, key: str):
+        """Return the filename previously generated for a prompt key, if it is still on disk"""
+        index_path = os.path.join(self.image_index_dir, key)
+        try:
+            with open(index_path, "r") as f:
+                filename = f.read().strip()
+        except FileNotFoundError:
+            return None
+        image_path = os.path.join(self.images_dir, filename) if filename else None
+        if image_path and os.path.exists(image_path):
+            # Refresh the timestamp so the garbage collector's grace period covers the reuse
+            os.utime(image_path)
+            return filename
+        return None
+
+    def save_thumbnail(self, image_path: str, filename: str):
+        """Write a small preview of an image for the conversation list"""
+        if Image is None:
+            return
+        thumbnail_path = os.path.join(self.thumbnails_dir, filename)
+        if os.path.exists(thumbnail_path):
+            return
+        try:
+            with Image.open(image_path) as image:
+                image.thumbnail(THUMBNAIL_SIZE)
+                tmp_path = f"{thumbnail_path}.{uuid.uuid4().hex}.tmp"
+                image.save(tmp_path, format="PNG", optimize=True)
+            os.replace(tmp_path, thumbnail_path)
+        except Exception as e:
+            logger.error(f"Error creating thumbnail for {filename}: {str(e)}")
+
+    def save_image(self, image_data: str, key: str = None) -> str:
+        """Decode a base64 image and store it content-addressed in the static directory, returns the filename"""
+        image_bytes = base64.b64decode(image_data)
+        filename = f"{hashlib.sha256(image_bytes).hexdigest()}.png"
+        
+        # Identical content is only ever stored once, so files never change after they are written
+        image_path = os.path.join(self.images_dir, filename)
+        if not os.path.exists(image_path):
+            self.write_file_atomic(image_path, image_bytes)
+        self.save_thumbnail(image_path, filename)
+        
+        if key:
+            self.write_file_atomic(os.path.join(self.image_index_dir, key), filename.encode("utf-8"))
+        return filename
+
+    def thumbnail_url(self, image_url: str):
+        """URL of the thumbnail for a generated image URL, if one was created"""
+        filename = os.path.basename(image_url)
+        if os.path.exists(os.path.join(self.thumbnails_dir, filename)):
+            return f"/static/images/thumbs/{filename}"
+        return None
+
     async def generate_image(self, prompt: str) -> str:
-        """Generate an image using DALL-E"""
+        """Generate an image using DALL-E, reusing the stored image for a repeated prompt"""
         try:
-            # Generate image using DALL-E
-            response = self.openai_client.images.generate(
-                model="dall-e-2",
-                prompt=prompt,
-                size="256x256",
-                n=1,
-                response_format="b64_json"
-            )
+            key = self.image_cache_key(prompt)
+            filename = await asyncio.to_thread(self.lookup_cached_image, key)
+            if filename:
+                logger.info(f"Reusing cached image for prompt: {prompt[:50]}")
+                return f"/static/images/{filename}"
+            
+            # Generate image using DALL-E, bounded so a burst of requests can't pile up upstream
+            async with self.image_semaphore:
+                with span("image"):
+                    response = await self.openai_client.images.generate(
+                        model=IMAGE_MODEL,
+                        prompt=prompt,
+                        size=IMAGE_SIZE,
+                        n=1,
+                        response_format="b64_json"
+                    )
             
             # Get the base64 image data
             image_data = response.data[0].b64_json
             
-            # Generate a unique filename
-            filename = f"{uuid.uuid4()}.png"
-            
-            # Save the image to the static directory
-            image_path = os.path.join(self.images_dir, filename)
-            with open(image_path, "wb") as f:
-                f.write(base64.b64decode(image_data))
+            # Decoding and writing the file happen in a thread to keep the event loop free
+            filename = await asyncio.to_thread(self.save_image, image_data, key)
             
             # Return the URL path
             return f"/static/images/{filename}"
             
         except Exception as e:
-            print(f"Error generating image: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception(f"Error generating image: {str(e)}")
             raise
 
     async def get_response(self, conversation_id: str, query: str, chat_history: list = None, is_image_generation: bool = False, is_web_search: bool = False) -> str:
         """Get response from the appropriate chain based on query language or generate image"""
+        from langchain_core.messages import AIMessage, HumanMessage
+        from app.services.tracing import StageTimingCallback
+
         if chat_history is None:
             chat_history = []
         
-        try:
-            # Handle image generation
-            if is_image_generation:
-                image_url = await self.generate_image(query)
-                # Create a more natural response for image generation
-                response = f"""I've generated an image based on your prompt: "{query}"
+        with self.using(conversation_id):
+            try:
+                # Handle image generation
+                if is_image_generation:
+                    image_url = await self.generate_image(query)
+                    thumbnail_url = self.thumbnail_url(image_url)
+                    thumbnail_attr = f' data-thumbnail="{thumbnail_url}"' if thumbnail_url else ""
+                    # Create a more natural response for image generation
+                    response = f"""I've generated an image based on your prompt: "{query}"
 
-                <img src="{image_url}" alt="Generated image" class="generated-image" />
+                    <img src="{image_url}" alt="Generated image" class="generated-image"{thumbnail_attr} />
 
-                Feel free to let me know if you'd like any adjustments to the image or if you'd like to generate another one with different parameters!"""
-                return response
+                    Feel free to let me know if you'd like any adjustments to the image or if you'd like to generate another one with different parameters!"""
+                    return response
+            
+                # Initialize RAG for this conversation if not already done, or again if another worker added documents
+                if conversation_id in self.preparing:
+                    # Already being set up since the conversation was opened
+                    await asyncio.shield(self.preparing[conversation_id])
+                self.refresh_if_stale(conversation_id)
+                if conversation_id not in self.chains:
+                    self.setup_rag(conversation_id)
+                else:
+                    self.touch(conversation_id)
+            
+                # Format chat history using langchain Message objects
+                formatted_history = []
+                for msg in chat_history:
+                    if msg['role'] == 'user':
+                        formatted_history.append(HumanMessage(content=msg['content']))
+                    elif msg['role'] == 'assistant':
+                        formatted_history.append(AIMessage(content=msg['content']))
+
+                # Detect language and use appropriate chain
+                lang = self.detect_language(query)
+                chain = self.chains[conversation_id]["zh" if lang == "zh" else "en"]
             
-            # Initialize RAG for this conversation if not already done
-            if conversation_id not in self.chains:
-                self.setup_rag(conversation_id)
-            
-            # Format chat history using langchain Message objects
-            formatted_history = []
-            for msg in chat_history:
-                if msg['role'] == 'user':
-                    formatted_history.append(HumanMessage(content=msg['content']))
-                elif msg['role'] == 'assistant':
-                    formatted_history.append(AIMessage(content=msg['content']))
-
-            # Detect language and use appropriate chain
-            lang = self.detect_language(query)
-            chain = self.chains[conversation_id]["zh" if lang == "zh" else "en"]
-            
-            # Handle web search
-            if is_web_search:
-                # Perform web search with timeout
-                search_results = await self.web_search(query)
+                # Handle web search
+                if is_web_search:
+                    # Perform web search within a single deadline shared by every stage
+                    deadline = Deadline(WEB_SEARCH_BUDGET)
+                    pages = await self.web_search(query, deadline)
                 
-                if search_results:
-                    # Extract source URLs for citation
-                    sources = []
-                    for result in search_results.split("Source: "):
-                        if result.strip():
-                            url_end = result.find("\n")
-                            if url_end > 0:
-                                url = result[:url_end].strip()
-                                if url and url not in sources and url.startswith("http"):
-                                    sources.append(url)
+                    if pages:
+                        # Only pass the passages relevant to the query, sources come from their metadata
+                        passages = await self.retrieve_web_passages(query, pages, deadline)
+                        search_results, sources = self.format_web_passages(passages)
                     
-                    # Add search results to the prompt
-                    prompt = WEB_SEARCH_RESPONSE_TEMPLATE.format(
-                        search_results=search_results,
-                        query=query
-                    )
+                        # Add search results to the prompt
+                        prompt = WEB_SEARCH_RESPONSE_TEMPLATE.format(
+                            search_results=search_results,
+                            query=query
+                        )
                                         
-                    # Get response using the chain
-                    result = await chain.ainvoke({
-                        "input": prompt,
-                        "chat_history": formatted_history
-                    })
+                        # Get response using the chain, its condense/retrieve/generate steps are timed separately
+                        with deadline.stage("answer"):
+                            result = await chain.ainvoke({
+                                "input": prompt,
+                                "chat_history": formatted_history
+                            }, config={"callbacks": [StageTimingCallback()]})
                     
-                    # Get the response
-                    response = result["answer"] if isinstance(result, dict) else str(result)
+                        # Get the response
+                        response = result["answer"] if isinstance(result, dict) else str(result)
                     
-                    # Format citations at the end
-                    if sources:
-                        response += "\n\nSources:\n"
-                        for i, source in enumerate(sources, 1):
-                            response += f"[{i}] {source}\n"
-                else:
-                    # No search results found
-                    response = f"I tried searching the web for information about '{query}', but couldn't find relevant results. Would you like me to try a different search query, or can I help you with something else?"
+                        # Format citations at the end
+                        if sources:
+                            response += "\n\nSources:\n"
+                            for i, source in enumerate(sources, 1):
+                                response += f"[{i}] {source}\n"
+                    else:
+                        # No search results found
+                        response = f"I tried searching the web for information about '{query}', but couldn't find relevant results. Would you like me to try a different search query, or can I help you with something else?"
                 
-                return response
+                    logger.info(f"Web search timings: {deadline.summary()}")
+                    return response
             
-            # Regular RAG response
-            # Get response using the chain
-            result = await chain.ainvoke({
-                "input": query,
-                "chat_history": formatted_history
-            })
+                # Regular RAG response
+                # Get response using the chain
+                result = await chain.ainvoke({
+                    "input": query,
+                    "chat_history": formatted_history
+                }, config={"callbacks": [StageTimingCallback()]})
             
-            # Get the response
-            response = result["answer"] if isinstance(result, dict) else str(result)
+                # Get the response
+                response = result["answer"] if isinstance(result, dict) else str(result)
             
-            return response
-        except Exception as e:
-            error_msg = f"Error in get_response for conversation {conversation_id}: {str(e)}"
-            print(error_msg)
-            print(traceback.format_exc())
-            raise Exception(error_msg)
+                return response
+            except Exception as e:
+                error_msg = f"Error in get_response for conversation {conversation_id}: {str(e)}"
+                logger.exception(error_msg)
+                raise Exception(error_msg)
 
 # Initialize global RAG service
 rag_service = RAGService()
\ No newline at end of file
@@ -0,0 +1,210 @@
+import logging
+import os
+import threading
+import time
+from app.core.config import settings
+from app.core.file_lock import try_hold_lock
+from app.core.paths import BACKEND_DIR
+from app.services.garbage_collector import TRASH_MARKER, garbage_collector
+from app.services.rag_service import (
+    EMBEDDING_MODEL, VECTOR_LOCK_FILE, VECTOR_MANIFEST_FILE, VECTOR_VERSION_FILE, VECTOR_VERSION_PREFIX, rag_service
+)
+
+logger = logging.getLogger(__name__)
+
+# Held by whichever worker process does the re-indexing
+REINDEX_LOCK_PATH = os.path.join(BACKEND_DIR, ".reindex.lock")
+
+# Entries of a conversation's vector directory that belong to the directory rather than to a version
+CONVERSATION_FILES = {VECTOR_LOCK_FILE, VECTOR_VERSION_FILE, VECTOR_MANIFEST_FILE}
+
+
+class Reindexer:
+    """Rebuilds, in a background thread, the vector stores embedded with another model than EMBEDDING_MODEL.
+
+    The new version is built next to the one in use from its stored chunk text, while reads
+    and writes keep going to the old one. Once it has every chunk, the manifest is switched
+    under the conversation's lock and the old version is discarded.
+    """
+
+    def __init__(self, interval: float, batch_size: int, pause_seconds: float, enabled: bool = True):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.enabled = enabled
+        self.stopping = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.reindex_lock = None  # Held by the one worker process that re-indexes
+        self.stats = {
+            "pending": None,
+            "current": None,
+            "conversations_reindexed": 0,
+            "chunks_embedded": 0,
+            "failures": 0,
+            "last_run_at": None,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Start the worker thread, which looks for stale stores right away and then every interval"""
+        if self.running or not self.enabled:
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name="reindexer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Stop the worker, a half-built version is discarded by the next run"""
+        if not self.running:
+            return
+        self.stopping.set()
+        self.thread.join(timeout)
+
+    def run(self):
+        while not self.stopping.is_set():
+            if self.is_reindexer():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    logger.exception(f"Re-indexing failed: {str(e)}")
+            self.stopping.wait(self.interval)
+
+    def is_reindexer(self) -> bool:
+        """With several workers only one re-indexes, so Ollama isn't asked for the same embeddings twice"""
+        if self.reindex_lock is None:
+            self.reindex_lock = try_hold_lock(REINDEX_LOCK_PATH)
+        return self.reindex_lock is not None
+
+    def pending(self):
+        """Conversations whose store was embedded with another model"""
+        conversation_ids = []
+        base_path = rag_service.base_vector_path
+        for name in sorted(os.listdir(base_path)) if os.path.isdir(base_path) else []:
+            if not name.startswith("conversation_") or TRASH_MARKER in name:
+                continue
+            conversation_id = name[len("conversation_"):]
+            _, model, _ = rag_service.active_vector_store(conversation_id, create=False)
+            if model is not None and model != EMBEDDING_MODEL:
+                conversation_ids.append(conversation_id)
+        return conversation_ids
+
+    def run_once(self) -> int:
+        """Re-index every pending conversation, returns how many were switched"""
+        conversation_ids = self.pending()
+        with self.lock:
+            self.stats["pending"] = len(conversation_ids)
+            self.stats["last_run_at"] = time.time()
+        if conversation_ids:
+            logger.info(f"Re-indexing {len(conversation_ids)} conversations with {EMBEDDING_MODEL}")
+        switched = 0
+        for conversation_id in conversation_ids:
+            if self.stopping.is_set():
+                break
+            with self.lock:
+                self.stats["current"] = conversation_id
+            try:
+                switched += self.reindex(conversation_id)
+            except Exception as e:
+                logger.exception(f"Re-indexing conversation {conversation_id} failed: {str(e)}")
+                with self.lock:
+                    self.stats["failures"] += 1
+                # Forget any client left open on the half-built version, the next run discards it
+                rag_service.release_vectorstore(conversation_id)
+            with self.lock:
+                self.stats["current"] = None
+                self.stats["pending"] -= 1
+        return switched
+
+    def discard_unused_versions(self, conversation_id: str, active: str):
+        """Remove versions left behind by an interrupted run"""
+        directory = rag_service.get_conversation_vector_path(conversation_id)
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.startswith(VECTOR_VERSION_PREFIX) and TRASH_MARKER not in name and path != active:
+                garbage_collector.discard(path)
+
+    def copy_missing(self, source, target, pause: float) -> bool:
+        """Embed the chunks of the source collection the target doesn't have, False if stopped part way"""
+        copied = set(target.get(include=[])["ids"])
+        missing = [chunk_id for chunk_id in source.get(include=[])["ids"] if chunk_id not in copied]
+        embeddings = rag_service.embeddings
+        for start in range(0, len(missing), self.batch_size):
+            if self.stopping.is_set():
+                return False
+            batch = source.get(ids=missing[start:start + self.batch_size], include=["documents", "metadatas"])
+            target.upsert(
+                ids=batch["ids"],
+                embeddings=embeddings.embed_documents(batch["documents"]),
+                documents=batch["documents"],
+                metadatas=[metadata or None for metadata in batch["metadatas"]]
+            )
+            with self.lock:
+                self.stats["chunks_embedded"] += len(batch["ids"])
+            if pause:
+                self.stopping.wait(pause)
+        return True
+
+    def reindex(self, conversation_id: str) -> bool:
+        """Build a version of the conversation's store with EMBEDDING_MODEL and switch to it"""
+        # The stores being copied are not closed by another conversation's use meanwhile
+        with rag_service.using(conversation_id):
+            directory = rag_service.get_conversation_vector_path(conversation_id)
+            old_path, old_model, old_backend = rag_service.active_vector_store(conversation_id, create=False)
+            if old_model is None or old_model == EMBEDDING_MODEL:
+                return False
+            self.discard_unused_versions(conversation_id, old_path)
+
+            start = time.monotonic()
+            version = rag_service.new_vector_version(EMBEDDING_MODEL)
+            with rag_service.vector_lock(conversation_id, shared=True):
+                source = rag_service.open_version(old_path, old_model, old_backend)._collection
+            # Small stores come back as a flat index, even if they were in Chroma before
+            backend = rag_service.new_store_backend(source.count())
+            target = rag_service.open_version(os.path.join(directory, version), EMBEDDING_MODEL, backend)._collection
+
+            # The bulk of the work, while the old version keeps serving
+            if not self.copy_missing(source, target, self.pause_seconds):
+                return False
+
+            with rag_service.vector_lock(conversation_id):
+                if rag_service.active_vector_store(conversation_id, create=False)[0] != old_path:
+                    logger.info(f"Vector store for conversation {conversation_id} changed while re-indexing, skipping")
+                    return False
+                # Chunks added while we were copying, the writers wait for these few. Reopened, as a
+                # flat index only sees writes made through the object that made them
+                source = rag_service.open_version(old_path, old_model, old_backend)._collection
+                if not self.copy_missing(source, target, pause=0):
+                    # Stopped before the new version had every chunk, it must not replace the old one
+                    return False
+                rag_service.write_manifest(conversation_id, version, EMBEDDING_MODEL, backend)
+                rag_service.bump_vector_version(conversation_id)
+                # Every worker, this one included, reopens the store on its next use
+                rag_service.release_vectorstore(conversation_id)
+
+                if old_path == directory:
+                    # Stores from before versioning were written straight into the conversation's directory
+                    for name in os.listdir(directory):
+                        if name not in CONVERSATION_FILES and not name.startswith(VECTOR_VERSION_PREFIX) and TRASH_MARKER not in name:
+                            garbage_collector.discard(os.path.join(directory, name))
+                else:
+                    garbage_collector.discard(old_path)
+
+            with self.lock:
+                self.stats["conversations_reindexed"] += 1
+            logger.info(
+                f"Re-indexed conversation {conversation_id} from {old_model} to {EMBEDDING_MODEL} "
+                f"in {time.monotonic() - start:.1f}s"
+            )
+            return True
+
+
+reindexer = Reindexer(
+    settings.REINDEX_INTERVAL_SECONDS,
+    settings.REINDEX_BATCH_SIZE,
+    settings.REINDEX_PAUSE_SECONDS,
+    enabled=settings.REINDEX_ENABLED
+)
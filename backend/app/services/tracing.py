@@ -0,0 +1,68 @@
+import time
+from typing import List
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from app.core.metrics import observe_stage, span
+
+# Tags set on the models in the RAG chains, telling the callback which stage a call belongs to
+CONDENSE_TAG = "condense"
+GENERATE_TAG = "generate"
+
+class StageTimingCallback(BaseCallbackHandler):
+    """Times the model and retriever calls made inside a chain as condense/retrieve/generate stages"""
+
+    run_inline = True  # Called on the event loop, keeps timing exact and adds no executor hop
+
+    def __init__(self):
+        self.started = {}  # run_id -> (stage, start)
+
+    def start(self, run_id, stage: str):
+        self.started[run_id] = (stage, time.perf_counter())
+
+    def end(self, run_id, error: bool = False):
+        stage, start = self.started.pop(run_id, (None, None))
+        if stage:
+            observe_stage(stage, time.perf_counter() - start, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        self.start(run_id, CONDENSE_TAG if CONDENSE_TAG in (tags or []) else GENERATE_TAG)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs):
+        self.start(run_id, CONDENSE_TAG if CONDENSE_TAG in (tags or []) else GENERATE_TAG)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self.end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.end(run_id, error=True)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self.start(run_id, "retrieve")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self.end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self.end(run_id, error=True)
+
+class TimedEmbeddings(Embeddings):
+    """Embeddings wrapper recording every call as an embed stage"""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("embed"):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with span("embed"):
+            return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with span("embed"):
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        with span("embed"):
+            return await self.embeddings.aembed_query(text)
@@ -0,0 +1,107 @@
+"""Authenticated API throughput under concurrent users.
+
+Each simulated user logs in, then loops over GET /api/conversations/summary and
+GET /api/conversations/{id}/messages for --duration seconds. Without --base-url
+the app is started in-process on a throwaway SQLite database.
+
+    python -m benchmarks.bench_api_concurrency --users 50 --duration 10
+    python -m benchmarks.bench_api_concurrency --base-url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+import httpx
+
+
+def start_local_server(port: int) -> str:
+    db_dir = tempfile.mkdtemp(prefix="bench_api_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    # Every file on disk looks orphaned to an empty database
+    os.environ["GC_SWEEP_ENABLED"] = "false"
+    os.environ["REINDEX_ENABLED"] = "false"
+
+    import uvicorn
+    from app.main import app
+    from app.db.init_db import init_db
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        init_db(db)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> dict:
+    response = await client.post("/api/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(base_url: str, users: int, duration: float, email: str, password: str) -> dict:
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        headers = await login(client, email, password)
+        response = await client.post("/api/conversations", json={"title": "Benchmark"}, headers=headers)
+        response.raise_for_status()
+        conversation_id = response.json()["id"]
+        paths = ["/api/conversations/summary", f"/api/conversations/{conversation_id}/messages"]
+
+        async def user_loop(index: int):
+            nonlocal errors
+            deadline = time.perf_counter() + duration
+            i = index
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(paths[i % len(paths)], headers=headers)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+                i += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user_loop(i) for i in range(users)))
+        elapsed = time.perf_counter() - start
+        await client.delete(f"/api/conversations/{conversation_id}", headers=headers)
+
+    return {
+        "users": users,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="benchmark a running server instead of an in-process one")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--email", default="test@example.com")
+    parser.add_argument("--password", default="test123")
+    args = parser.parse_args()
+
+    base_url = args.base_url or start_local_server(args.port)
+    print(asyncio.run(run(base_url, args.users, args.duration, args.email, args.password)))
@@ -0,0 +1,127 @@
+"""Conversation list benchmark: full GET /conversations vs the paginated summary.
+
+Seeds a throwaway SQLite database with one user owning --conversations
+conversations of --messages messages each, then times both handlers including
+JSON serialization and counts the SQL statements each one issues.
+
+    python -m benchmarks.bench_conversation_list --conversations 1000 --messages 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_db_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from typing import List
+from pydantic import TypeAdapter
+from sqlalchemy import event, insert
+
+from app.api.conversations import get_conversation_summaries, get_conversations
+from app.db.init_db import init_db
+from app.db.session import AsyncSessionLocal, SessionLocal, async_engine
+from app.models.conversation import Conversation, Message
+from app.models.user import User
+from app.schemas.conversation import ConversationResponse
+
+MESSAGE_TEXT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 14
+
+
+def seed(db, conversations: int, messages: int) -> User:
+    user = db.query(User).filter(User.email == "test@example.com").first()
+    start = datetime.utcnow() - timedelta(days=365)
+    db.execute(insert(Conversation), [
+        {
+            "title": f"Conversation {i}",
+            "user_id": user.id,
+            "created_at": start + timedelta(minutes=i),
+            "updated_at": start + timedelta(minutes=i, seconds=30),
+        }
+        for i in range(conversations)
+    ])
+    conversation_ids = [row.id for row in db.query(Conversation.id).filter(Conversation.user_id == user.id)]
+    for conversation_id in conversation_ids:
+        db.execute(insert(Message), [
+            {
+                "content": MESSAGE_TEXT,
+                "role": "user" if j % 2 == 0 else "assistant",
+                "conversation_id": conversation_id,
+                "created_at": start + timedelta(minutes=conversation_id, seconds=j),
+                "updated_at": start + timedelta(minutes=conversation_id, seconds=j),
+            }
+            for j in range(messages)
+        ])
+    db.commit()
+    return user
+
+
+async def timed(label: str, fn, repeat: int) -> dict:
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        durations = []
+        for _ in range(repeat):
+            statements.clear()
+            start = time.perf_counter()
+            payload = await fn()
+            durations.append(time.perf_counter() - start)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+    return {
+        "case": label,
+        "best_ms": round(min(durations) * 1000, 1),
+        "statements": len(statements),
+        "payload_bytes": len(payload),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with SessionLocal() as sync_db:
+        init_db(sync_db)
+        user = seed(sync_db, args.conversations, args.messages)
+    db = AsyncSessionLocal()
+    full_adapter = TypeAdapter(List[ConversationResponse])
+
+    async def full_list():
+        db.expunge_all()
+        conversations = await get_conversations(db=db, current_user=user)
+        return full_adapter.dump_json(full_adapter.validate_python(conversations, from_attributes=True))
+
+    async def first_page():
+        page = await get_conversation_summaries(limit=args.page_size, cursor=None, db=db, current_user=user)
+        return page.model_dump_json().encode("utf-8")
+
+    async def all_pages():
+        payload, cursor = b"", None
+        while True:
+            page = await get_conversation_summaries(limit=args.page_size, cursor=cursor, db=db, current_user=user)
+            payload += page.model_dump_json().encode("utf-8")
+            cursor = page.next_cursor
+            if cursor is None:
+                return payload
+
+    results = [
+        await timed("GET /conversations (full)", full_list, args.repeat),
+        await timed(f"GET /conversations/summary (first {args.page_size})", first_page, args.repeat),
+        await timed("GET /conversations/summary (every page)", all_pages, args.repeat),
+    ]
+    await db.close()
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""Conversation payload benchmark: bytes and latency of GET /api/conversations/{id}/messages.
+
+Seeds a realistic conversation (--turns question/answer pairs mixing long
+markdown answers, web search answers with source lists and generated image
+HTML) and fetches its messages in one page, as the chat does when it is opened,
+uncompressed, gzip-compressed, and as a revalidation with If-None-Match that the
+server answers with 304.
+
+    python -m benchmarks.bench_conversation_payload --turns 40
+"""
+import argparse
+import hashlib
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.bench_api_concurrency import start_local_server
+
+MARKDOWN_ANSWER = """Here is a breakdown of **{topic}**:
+
+1. **Overview** - {topic} is commonly used to structure larger applications, and it helps to keep
+   responsibilities separate so each part can be tested on its own.
+2. **When to use it** - prefer it once the codebase has more than a handful of modules, or when
+   several people work on the same service.
+3. **Trade-offs** - it adds some indirection, so for small scripts the simpler approach is fine.
+
+```python
+def example(items):
+    # Group the items by their first letter
+    groups = {{}}
+    for item in items:
+        groups.setdefault(item[0], []).append(item)
+    return groups
+```
+
+{detail}
+
+In short, {topic} pays off as the project grows. Let me know if you'd like a longer example!"""
+
+WEB_ANSWER = """{topic} has changed considerably over the last few years. Recent releases focused on
+performance and developer experience, with most of the ecosystem following within months. Adoption
+is highest among teams that already use the surrounding tooling, and the official documentation now
+covers migration from older versions in detail. Community benchmarks report noticeable improvements
+for typical workloads. {detail}
+
+Sources:
+[1] https://en.wikipedia.org/wiki/{slug}
+[2] https://www.example.com/blog/{slug}-in-depth-review-and-comparison
+[3] https://docs.example.org/guides/{slug}/getting-started
+[4] https://news.example.net/2024/05/{slug}-release-announcement
+"""
+
+IMAGE_ANSWER = """I've generated an image based on your prompt: "{topic}"
+
+                <img src="/static/images/{digest}.png" alt="Generated image" class="generated-image" data-thumbnail="/static/images/thumbs/{digest}.png" />
+
+                Feel free to let me know if you'd like any adjustments to the image or if you'd like to generate another one with different parameters!"""
+
+# Answers get a paragraph of shuffled words so the fixture doesn't compress unrealistically well
+WORDS = sorted({word for word in (MARKDOWN_ANSWER + WEB_ANSWER).split() if "{" not in word})
+
+TOPICS = ["dependency injection", "event sourcing", "vector databases", "async IO", "type hints",
+          "database indexing", "caching strategies", "message queues", "unit testing", "observability"]
+
+
+def seed(turns: int) -> int:
+    from app.db.session import SessionLocal
+    from app.models.conversation import Conversation, Message
+    from app.models.user import User
+
+    rng = random.Random(7)
+    start = datetime.utcnow() - timedelta(days=1)
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == "test@example.com").first()
+        conversation = Conversation(title="Payload benchmark", user_id=user.id, created_at=start, updated_at=start)
+        db.add(conversation)
+        db.flush()
+        for i in range(turns):
+            topic = rng.choice(TOPICS)
+            kind = i % 5
+            detail = " ".join(rng.choice(WORDS) for _ in range(120))
+            if kind == 3:
+                answer = WEB_ANSWER.format(topic=topic.title(), slug=topic.replace(" ", "_"), detail=detail)
+            elif kind == 4:
+                answer = IMAGE_ANSWER.format(topic=topic, digest=hashlib.sha256(f"{i}".encode()).hexdigest())
+            else:
+                answer = MARKDOWN_ANSWER.format(topic=topic, detail=detail)
+            db.add_all([
+                Message(content=f"Can you explain {topic} with an example? ({i})", role="user",
+                        conversation_id=conversation.id, created_at=start + timedelta(seconds=2 * i)),
+                Message(content=answer, role="assistant",
+                        conversation_id=conversation.id, created_at=start + timedelta(seconds=2 * i + 1)),
+            ])
+        db.commit()
+        return conversation.id
+
+
+PAGE_SIZE = 200  # The most the messages endpoint returns at once
+
+
+def measure(client: httpx.Client, path: str, headers: dict, repeat: int) -> dict:
+    durations, transferred, status = [], 0, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        durations.append(time.perf_counter() - start)
+        transferred = response.num_bytes_downloaded
+        status = response.status_code
+    return {
+        "status": status,
+        "bytes": transferred,
+        "median_ms": round(statistics.median(durations) * 1000, 2),
+    }
+
+
+def run(base_url: str, conversation_id: int, repeat: int) -> list:
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        response = client.post("/api/auth/login", data={"username": "test@example.com", "password": "test123"})
+        response.raise_for_status()
+        auth = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        path = f"/api/conversations/{conversation_id}/messages?limit={PAGE_SIZE}"
+        etag = client.get(path, headers=auth).headers["ETag"]
+        return [
+            {"case": "uncompressed", **measure(client, path, {**auth, "Accept-Encoding": "identity"}, repeat)},
+            {"case": "gzip", **measure(client, path, {**auth, "Accept-Encoding": "gzip"}, repeat)},
+            {"case": "revalidate (If-None-Match)", **measure(client, path, {**auth, "If-None-Match": etag}, repeat)},
+        ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8210)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    base_url = start_local_server(args.port)
+    conversation_id = seed(args.turns)
+    for result in run(base_url, conversation_id, args.repeat):
+        print(result)
@@ -0,0 +1,76 @@
+"""Image generation throughput against the local fake image API.
+
+Starts benchmarks.fake_image_api in a background thread, fires concurrent
+RAGService.generate_image calls at it and reports throughput together with the
+worst event loop stall observed while they ran.
+
+    python -m benchmarks.bench_image_generation --requests 40 --latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import uvicorn
+
+
+def start_fake_api(port: int, latency: float) -> uvicorn.Server:
+    from benchmarks.fake_image_api import app
+
+    app.state.latency = latency
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Largest delay between when a tick was due and when it ran"""
+    worst = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - due)
+    return worst
+
+
+async def run(requests: int) -> dict:
+    from app.services.rag_service import rag_service
+
+    rag_service.images_dir = tempfile.mkdtemp(prefix="bench_images_")
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(rag_service.generate_image(f"benchmark prompt {i}") for i in range(requests)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    return {
+        "requests": requests,
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "max_loop_lag_ms": round(await lag_task * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=1.0, help="fake upstream latency in seconds")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    start_fake_api(args.port, args.latency)
+    print(asyncio.run(run(args.requests)))
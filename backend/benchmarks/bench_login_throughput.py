@@ -0,0 +1,93 @@
+"""Login throughput and event loop responsiveness during a login storm.
+
+Part one verifies --logins passwords concurrently, first with bcrypt called on the
+event loop (the old behaviour) and then through the bounded hashing pool, and
+reports the worst event loop stall. Part two sends concurrent POST /api/auth/login
+requests to the app while probing GET /api/health, to show how much a login storm
+delays other traffic.
+
+    python -m benchmarks.bench_login_throughput --logins 64 --users 32 --duration 10
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from benchmarks.bench_api_concurrency import percentile, start_local_server
+from benchmarks.bench_image_generation import measure_loop_lag
+
+
+async def verify_storm(logins: int, off_loop: bool) -> dict:
+    from app.core.security import get_password_hash, pwd_context, verify_and_update_password
+
+    hashed = get_password_hash("benchmark-password")
+
+    async def verify():
+        if off_loop:
+            return await verify_and_update_password("benchmark-password", hashed)
+        return pwd_context.verify_and_update("benchmark-password", hashed)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(verify() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return {
+        "case": "hashing pool" if off_loop else "on event loop",
+        "logins": logins,
+        "logins_per_s": round(logins / elapsed, 1),
+        "max_loop_lag_ms": round(await lag_task * 1000, 1),
+    }
+
+
+async def http_storm(base_url: str, users: int, duration: float, email: str, password: str) -> dict:
+    login_latencies, probe_latencies, errors = [], [], 0
+    deadline = time.perf_counter() + duration
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+
+        async def login_loop():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await client.post("/api/auth/login", data={"username": email, "password": password})
+                errors += response.status_code != 200
+                login_latencies.append(time.perf_counter() - start)
+
+        async def probe_loop():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/api/health")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(probe_loop(), *(login_loop() for _ in range(users)))
+
+    return {
+        "users": users,
+        "logins": len(login_latencies),
+        "errors": errors,
+        "logins_per_s": round(len(login_latencies) / duration, 1),
+        "login_p95_ms": round(percentile(login_latencies, 0.95) * 1000, 1),
+        "health_p50_ms": round(statistics.median(probe_latencies) * 1000, 1),
+        "health_max_ms": round(max(probe_latencies) * 1000, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--base-url", help="benchmark a running server instead of an in-process one")
+    parser.add_argument("--port", type=int, default=8201)
+    parser.add_argument("--email", default="test@example.com")
+    parser.add_argument("--password", default="test123")
+    args = parser.parse_args()
+
+    base_url = args.base_url or start_local_server(args.port)
+    for off_loop in (False, True):
+        print(asyncio.run(verify_storm(args.logins, off_loop)))
+    print(asyncio.run(http_storm(base_url, args.users, args.duration, args.email, args.password)))
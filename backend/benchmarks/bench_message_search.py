@@ -0,0 +1,163 @@
+"""Message search benchmark: FTS5 search endpoint vs a LIKE scan.
+
+Seeds a throwaway SQLite database with --users users, each owning conversations
+of generated text (--messages rows in total, indexed by the FTS5 triggers as they
+are inserted), then times the search handler for one user with rare, common and
+multi-term queries, first page and a deep page, against the LIKE query it replaces.
+One message in CHINESE_EVERY ends in a Chinese phrase, written without spaces as
+Chinese is, and is searched for by a two-character word from the middle (LIKE over
+the user's messages) and a three-character one (trigram index).
+
+    python -m benchmarks.bench_message_search --messages 1000000 --users 1000
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bench_db_"), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from sqlalchemy import func, insert, select
+
+from app.api.conversations import search_messages
+from app.db.init_db import init_db
+from app.db.session import AsyncSessionLocal, SessionLocal, async_engine
+from app.models.conversation import Conversation, Message
+from app.models.user import User
+
+# Word frequencies fall off like natural text, so there are both rare and very common terms
+VOCABULARY = [f"word{i}" for i in range(20000)]
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+MESSAGES_PER_CONVERSATION = 20
+CHINESE_PHRASES = ["你好世界", "今天天气很好", "机器学习模型", "向量数据库检索"]
+CHINESE_EVERY = 10
+BATCH_SIZE = 20000
+
+
+def seed(db, users: int, messages: int, words: int) -> User:
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=365)
+    db.execute(insert(User), [
+        {"email": f"user{i}@example.com", "name": f"User {i}", "hashed_password": "x", "is_active": True}
+        for i in range(users)
+    ])
+    user_ids = list(db.scalars(select(User.id).where(User.email.like("user%@example.com"))))
+    conversations = max(1, messages // MESSAGES_PER_CONVERSATION)
+    db.execute(insert(Conversation), [
+        {
+            "title": f"Conversation {i}",
+            "user_id": user_ids[i % len(user_ids)],
+            "created_at": start,
+            "updated_at": start,
+        }
+        for i in range(conversations)
+    ])
+    conversation_ids = list(db.scalars(select(Conversation.id)))
+    db.commit()
+
+    for batch_start in range(0, messages, BATCH_SIZE):
+        rows = []
+        for i in range(batch_start, min(messages, batch_start + BATCH_SIZE)):
+            text = " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=words))
+            if i % CHINESE_EVERY == 0:
+                text += " " + rng.choice(CHINESE_PHRASES)
+            rows.append({
+                "content": text,
+                "role": "user" if i % 2 == 0 else "assistant",
+                "conversation_id": conversation_ids[i % len(conversation_ids)],
+                "created_at": start + timedelta(seconds=i),
+                "updated_at": start + timedelta(seconds=i),
+            })
+        db.execute(insert(Message), rows)
+        db.commit()
+    return db.get(User, user_ids[0])
+
+
+async def timed(label: str, fn, repeat: int) -> dict:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = await fn()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return {
+        "case": label,
+        "best_ms": round(durations[0] * 1000, 2),
+        "median_ms": round(durations[len(durations) // 2] * 1000, 2),
+        "results": count,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--words", type=int, default=40, help="words per message")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with SessionLocal() as sync_db:
+        init_db(sync_db)
+        start = time.perf_counter()
+        user = seed(sync_db, args.users, args.messages, args.words)
+        seed_seconds = time.perf_counter() - start
+    print({"messages": args.messages, "users": args.users, "seed_rows_per_s": round(args.messages / seed_seconds)})
+
+    db = AsyncSessionLocal()
+
+    def search(q: str, offset: int = 0):
+        async def run():
+            page = await search_messages(q=q, limit=args.page_size, offset=offset, db=db, current_user=user)
+            return len(page.items)
+        return run
+
+    def like_scan(term: str, pattern: str = "%{} %"):
+        async def run():
+            query = (
+                select(Message.id)
+                .join(Conversation, Conversation.id == Message.conversation_id)
+                .where(Conversation.user_id == user.id, Message.content.like(pattern.format(term)))
+                .limit(args.page_size)
+            )
+            return len((await db.execute(query)).all())
+        return run
+
+    async def user_messages():
+        query = (
+            select(func.count(Message.id))
+            .join(Conversation, Conversation.id == Message.conversation_id)
+            .where(Conversation.user_id == user.id)
+        )
+        return (await db.execute(query)).scalar()
+
+    rare, common = VOCABULARY[2000], VOCABULARY[3]
+    chinese_short, chinese_long = CHINESE_PHRASES[0][2:], CHINESE_PHRASES[1][2:5]
+    results = [
+        await timed("messages owned by the user", user_messages, 1),
+        await timed(f"FTS rare term ({rare})", search(rare), args.repeat),
+        await timed(f"FTS common term ({common})", search(common), args.repeat),
+        await timed("FTS common term, offset 1000", search(common, 1000), args.repeat),
+        await timed(f"FTS two terms ({common} {VOCABULARY[50]})", search(f"{common} {VOCABULARY[50]}"), args.repeat),
+        await timed("FTS no match", search("nonexistentword"), args.repeat),
+        await timed(f"Search Chinese two characters ({chinese_short})", search(chinese_short), args.repeat),
+        await timed(f"Search Chinese three characters ({chinese_long})", search(chinese_long), args.repeat),
+        await timed(f"LIKE scan rare term ({rare})", like_scan(rare), args.repeat),
+        await timed(f"LIKE scan common term ({common})", like_scan(common), args.repeat),
+        await timed(f"LIKE scan Chinese term ({chinese_long})", like_scan(chinese_long, "%{}%"), args.repeat),
+    ]
+    await db.close()
+    await async_engine.dispose()
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
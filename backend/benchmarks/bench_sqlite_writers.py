@@ -0,0 +1,116 @@
+"""Concurrent chat-turn writers on SQLite, before and after the tuned profile.
+
+Each writer thread runs --turns chat turns against its own conversation. The
+"baseline" case uses a default engine and the old persistence pattern (commit and
+refresh the user message, read the history, commit and refresh the answer); the
+"tuned" case uses the connection pragmas from app.db.session and one commit per
+turn. Reports throughput and the number of "database is locked" failures.
+
+    python -m benchmarks.bench_sqlite_writers --writers 16 --turns 50
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import apply_sqlite_pragmas
+from app.models.base import Base
+from app.models.conversation import Conversation, Message
+from app.models.user import User
+
+ANSWER = "The answer is a few paragraphs of markdown. " * 40
+
+
+def make_sessionmaker(tuned: bool):
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_sqlite_"), "bench.db")
+    if tuned:
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 5})
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    else:
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine, autoflush=False, expire_on_commit=not tuned)
+
+
+def baseline_turn(db, conversation_id: int):
+    user_message = Message(content="question", role="user", conversation_id=conversation_id)
+    db.add(user_message)
+    db.commit()
+    db.refresh(user_message)
+    db.query(Message).filter(Message.conversation_id == conversation_id).order_by(Message.created_at.asc()).all()
+    answer = Message(content=ANSWER, role="assistant", conversation_id=conversation_id)
+    db.add(answer)
+    db.commit()
+    db.refresh(answer)
+
+
+def tuned_turn(db, conversation_id: int):
+    user_message = Message(content="question", role="user", conversation_id=conversation_id, created_at=datetime.utcnow())
+    db.query(Message).filter(Message.conversation_id == conversation_id).order_by(
+        Message.created_at.desc(), Message.id.desc()
+    ).limit(50).all()
+    db.commit()
+    answer = Message(content=ANSWER, role="assistant", conversation_id=conversation_id)
+    db.add_all([user_message, answer])
+    db.commit()
+
+
+def run(tuned: bool, writers: int, turns: int) -> dict:
+    engine, Session = make_sessionmaker(tuned)
+    with Session() as db:
+        user = User(email="bench@example.com", name="Bench", hashed_password="x")
+        db.add(user)
+        db.flush()
+        conversations = [Conversation(title=f"Writer {i}", user_id=user.id) for i in range(writers)]
+        db.add_all(conversations)
+        db.commit()
+        conversation_ids = [conversation.id for conversation in conversations]
+
+    turn = tuned_turn if tuned else baseline_turn
+    errors = []
+    completed = []
+
+    def writer(conversation_id):
+        with Session() as db:
+            for _ in range(turns):
+                try:
+                    turn(db, conversation_id)
+                    completed.append(1)
+                except OperationalError as e:
+                    db.rollback()
+                    errors.append(str(e.orig))
+
+    threads = [threading.Thread(target=writer, args=(conversation_id,)) for conversation_id in conversation_ids]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return {
+        "case": "tuned" if tuned else "baseline",
+        "turns": len(completed),
+        "locked_errors": sum("locked" in error for error in errors),
+        "elapsed_s": round(elapsed, 2),
+        "turns_per_s": round(len(completed) / elapsed, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+    for tuned in (False, True):
+        print(run(tuned, args.writers, args.turns))
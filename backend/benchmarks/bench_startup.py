@@ -0,0 +1,140 @@
+"""Measure process startup: import cost per module, time to first response, warm-up.
+
+Each run is a fresh interpreter, so nothing is cached between runs except the
+OS page cache (the first run is usually slower and is reported separately).
+
+  import      `python -X importtime -c "import app.main"`, total and the most
+              expensive modules, grouped by top-level package
+  health      seconds from spawning uvicorn until /api/health answers
+  warm_up     seconds RAGService.warm_up takes after app.main is imported
+
+    python -m benchmarks.bench_startup --runs 5 --top 15
+    python -m benchmarks.bench_startup --output startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_PACKAGES = {"langchain", "langchain_core", "langchain_ollama", "langchain_chroma", "chromadb", "openai", "trafilatura", "bs4"}
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    db_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    env.setdefault("SECRET_KEY", "benchmark")
+    env["GC_SWEEP_ENABLED"] = "false"
+    env["REINDEX_ENABLED"] = "false"
+    return env
+
+
+def measure_imports(env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    modules, packages, total = {}, defaultdict(int), 0
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), match[3], match[4]
+        modules[name] = cumulative_us
+        packages[name.split(".")[0]] += self_us
+        if name == "app.main" and len(indent) == 1:
+            total = cumulative_us
+    return {"total_us": total, "modules": modules, "packages": dict(packages)}
+
+
+def measure_health(env: dict, port: int) -> float:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited before answering")
+            time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def measure_warm_up(env: dict) -> float:
+    code = (
+        "import time, app.main\n"
+        "from app.services.rag_service import rag_service\n"
+        "start = time.perf_counter(); rag_service.warm_up(); print(time.perf_counter() - start)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="modules and packages listed")
+    parser.add_argument("--port", type=int, default=8140)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    env = child_env()
+    # RAG_WARM_UP would compete with the import and health measurements for the CPU
+    env["RAG_WARM_UP"] = "false"
+    imports = [measure_imports(env) for _ in range(args.runs + 1)]
+    first, imports = imports[0], imports[1:]
+    health = [measure_health(env, args.port) for _ in range(args.runs)]
+    warm_up = [measure_warm_up(env) for _ in range(args.runs)]
+
+    def median_of(key, name):
+        return statistics.median(run[key].get(name, 0) for run in imports) / 1000
+
+    modules = sorted(imports[0]["modules"], key=lambda name: median_of("modules", name), reverse=True)
+    packages = sorted(imports[0]["packages"], key=lambda name: median_of("packages", name), reverse=True)
+    results = {
+        "import_app_main_ms": round(statistics.median(run["total_us"] for run in imports) / 1000, 1),
+        "import_app_main_first_run_ms": round(first["total_us"] / 1000, 1),
+        "health_ready_ms": round(statistics.median(health) * 1000, 1),
+        "warm_up_ms": round(statistics.median(warm_up) * 1000, 1),
+        "packages_self_ms": {name: round(median_of("packages", name), 1) for name in packages[:args.top]},
+        "modules_cumulative_ms": {name: round(median_of("modules", name), 1) for name in modules[:args.top]},
+        # The libraries warm_up exists for, so a regression that imports them eagerly again stands out
+        "heavy_modules_loaded": sorted(name for name in imports[0]["modules"] if name in HEAVY_PACKAGES),
+    }
+
+    print(f"import app.main   {results['import_app_main_ms']:>8.1f} ms (first run {results['import_app_main_first_run_ms']:.1f} ms)")
+    print(f"/api/health ready {results['health_ready_ms']:>8.1f} ms")
+    print(f"warm_up           {results['warm_up_ms']:>8.1f} ms")
+    print(f"heavy packages imported at startup: {', '.join(results['heavy_modules_loaded']) or 'none'}")
+    print("\nself time by package:")
+    for name, ms in results["packages_self_ms"].items():
+        print(f"  {name:<40} {ms:>8.1f} ms")
+    print("\ncumulative time by module:")
+    for name, ms in results["modules_cumulative_ms"].items():
+        print(f"  {name:<40} {ms:>8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Offline benchmark suite: ingestion, get_response per mode and API throughput.
+
+Starts the local fakes (benchmarks.fake_ollama, benchmarks.fake_image_api and
+benchmarks.fake_web) and the app itself in-process on a throwaway database and
+data directories, then measures:
+
+  ingestion     PDF load, split and embedding throughput
+  get_response  latency of RAG, web search and image answers
+  api           concurrent users posting messages, and reading conversations
+
+Results are written as JSON (git commit, settings and every metric) so two
+versions can be compared with benchmarks.compare_results.
+
+    python -m benchmarks.bench_suite --output results/main.json
+    python -m benchmarks.bench_suite --first-token 0.5 --token-latency 0.02 --users 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import httpx
+import uvicorn
+
+from benchmarks.bench_api_concurrency import login, percentile, run as run_read_load, start_local_server
+from benchmarks.fixtures import TOPICS, document_pages, make_pdf
+
+OLLAMA_PORT = 8110
+WEB_PORT = 8120
+IMAGE_PORT = 8100
+API_PORT = 8130
+
+
+def start_fake(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def start_fakes(args):
+    from benchmarks import fake_image_api, fake_ollama, fake_web
+
+    fake_ollama.app.state.first_token = args.first_token
+    fake_ollama.app.state.token_latency = args.token_latency
+    fake_ollama.app.state.embed_latency = args.embed_latency
+    fake_ollama.app.state.answer_tokens = args.answer_tokens
+    fake_web.app.state.search_latency = args.search_latency
+    fake_web.app.state.page_latency = args.page_latency
+    fake_image_api.app.state.latency = args.image_latency
+    start_fake(fake_ollama.app, OLLAMA_PORT)
+    start_fake(fake_web.app, WEB_PORT)
+    start_fake(fake_image_api.app, IMAGE_PORT)
+
+
+def summarize(durations) -> dict:
+    return {
+        "runs": len(durations),
+        "mean_ms": round(statistics.mean(durations) * 1000, 1),
+        "p50_ms": round(statistics.median(durations) * 1000, 1),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 1),
+        "max_ms": round(max(durations) * 1000, 1),
+    }
+
+
+def bench_ingestion(rag_service, data_dir: str, documents: int, pages: int) -> dict:
+    stages = {"load": 0.0, "split": 0.0, "embed": 0.0}
+    total_pages = total_chunks = 0
+    for i in range(documents):
+        path = os.path.join(data_dir, f"report_{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf(document_pages(pages, seed=i)))
+
+        start = time.perf_counter()
+        loaded = rag_service.load_single_document(path, f"report_{i}.pdf")
+        stages["load"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        chunks = rag_service.split_documents(loaded)
+        stages["split"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        rag_service.add_documents(f"ingest_{i}", chunks)
+        stages["embed"] += time.perf_counter() - start
+
+        total_pages += len(loaded)
+        total_chunks += len(chunks)
+
+    elapsed = sum(stages.values())
+    return {
+        "documents": documents,
+        "pages": total_pages,
+        "chunks": total_chunks,
+        "elapsed_s": round(elapsed, 3),
+        "pages_per_s": round(total_pages / elapsed, 1),
+        "chunks_per_s": round(total_chunks / elapsed, 1),
+        **{f"{stage}_s": round(seconds, 3) for stage, seconds in stages.items()},
+    }
+
+
+async def bench_get_response(rag_service, iterations: int) -> dict:
+    history = [
+        {"role": "user", "content": "What does the report say about solar power?"},
+        {"role": "assistant", "content": "It describes how costs fell and efficiency improved."},
+    ]
+    results = {}
+    modes = {
+        "rag": {},
+        "web_search": {"is_web_search": True},
+        "image": {"is_image_generation": True},
+    }
+    for mode, flags in modes.items():
+        durations = []
+        for i in range(iterations):
+            topic = TOPICS[i % len(TOPICS)]
+            start = time.perf_counter()
+            # Image prompts differ every time so the prompt cache doesn't answer them
+            await rag_service.get_response(
+                conversation_id="ingest_0",
+                query=f"What is new in {topic}? ({mode} {i})",
+                chat_history=history,
+                **flags
+            )
+            durations.append(time.perf_counter() - start)
+        results[mode] = summarize(durations)
+    return results
+
+
+async def bench_api_writes(base_url: str, users: int, duration: float) -> dict:
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        headers = await login(client, "test@example.com", "test123")
+
+        async def user_loop(index: int):
+            nonlocal errors
+            response = await client.post("/api/conversations", json={"title": f"Load {index}"}, headers=headers)
+            response.raise_for_status()
+            conversation_id = response.json()["id"]
+            deadline = time.perf_counter() + duration
+            i = 0
+            while time.perf_counter() < deadline:
+                path = f"/api/conversations/{conversation_id}"
+                start = time.perf_counter()
+                try:
+                    if i % 2 == 0:
+                        response = await client.post(f"{path}/messages", json={"content": f"Question {i} about {TOPICS[i % len(TOPICS)]}"}, headers=headers)
+                    else:
+                        response = await client.get(f"{path}/messages", headers=headers)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+                i += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user_loop(i) for i in range(users)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "users": users,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+    }
+
+
+def git_version() -> dict:
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+def add_fake_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--first-token", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.005)
+    parser.add_argument("--embed-latency", type=float, default=0.002)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.5)
+    parser.add_argument("--image-latency", type=float, default=1.0)
+
+
+def start_offline_app(args):
+    """Start the fakes and the app on a throwaway database and data directories"""
+    # Everything the app talks to is local, and nothing it writes lands in the real data directories
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{OLLAMA_PORT}"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{IMAGE_PORT}/v1"
+    os.environ["SEARCH_URL"] = f"http://127.0.0.1:{WEB_PORT}/html/"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    start_fakes(args)
+    base_url = start_local_server(API_PORT)
+
+    from app.api import documents
+    from app.services.rag_service import rag_service
+
+    data_dir = tempfile.mkdtemp(prefix="bench_suite_")
+    documents.UPLOAD_ROOT = os.path.join(data_dir, "Root")
+    rag_service.base_vector_path = os.path.join(data_dir, "vector_db")
+    rag_service.images_dir = os.path.join(data_dir, "images")
+    rag_service.image_index_dir = os.path.join(data_dir, "image_prompts")
+    rag_service.thumbnails_dir = os.path.join(data_dir, "images", "thumbs")
+    for path in (rag_service.base_vector_path, rag_service.image_index_dir, rag_service.thumbnails_dir):
+        os.makedirs(path, exist_ok=True)
+    return base_url, rag_service, data_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=5, help="get_response calls per mode")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0)
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+    base_url, rag_service, data_dir = start_offline_app(args)
+
+    results = {}
+    print("ingestion...", file=sys.stderr)
+    results["ingestion"] = bench_ingestion(rag_service, data_dir, args.documents, args.pages)
+    print("get_response...", file=sys.stderr)
+    results["get_response"] = asyncio.run(bench_get_response(rag_service, args.iterations))
+    print("api...", file=sys.stderr)
+    results["api"] = {
+        "messages": asyncio.run(bench_api_writes(base_url, args.users, args.duration)),
+        "reads": asyncio.run(run_read_load(base_url, args.users, args.duration, "test@example.com", "test123")),
+    }
+
+    report = {
+        "suite": "offline",
+        "version": git_version(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+    output = args.output
+    if not output:
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(os.path.dirname(__file__), "results", f"{report['version']['commit'] or 'unknown'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compare two benchmark result files written by benchmarks.bench_suite.
+
+Prints every numeric metric found in both files with its relative change.
+Latencies (*_ms, *_s) improve when they go down, throughput (*_per_s) when it
+goes up; changes beyond --threshold percent in the wrong direction are flagged.
+
+    python -m benchmarks.compare_results results/main.json results/branch.json
+"""
+import argparse
+import json
+import sys
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+
+def higher_is_better(metric: str) -> bool:
+    name = metric.rsplit(".", 1)[-1]
+    return name.endswith("_per_s") or name.endswith("_rps")
+
+
+def compare(base: dict, new: dict, threshold: float):
+    base_metrics = dict(flatten(base["results"]))
+    rows, regressions = [], 0
+    for metric, value in flatten(new["results"]):
+        if metric not in base_metrics:
+            continue
+        old = base_metrics[metric]
+        change = (value - old) / old * 100 if old else 0.0
+        if metric.endswith(".errors"):
+            worse = value > old
+        elif metric.endswith(("_ms", "_s", "_rps")):
+            worse = change < -threshold if higher_is_better(metric) else change > threshold
+        else:
+            worse = False  # Counts describe the workload rather than its speed
+        flag = "REGRESSION" if worse else ""
+        regressions += bool(flag)
+        rows.append((metric, old, value, change, flag))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change treated as a regression")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"base: {base['version'].get('commit')} ({base['created_at']})  new: {new['version'].get('commit')} ({new['created_at']})")
+    if base.get("config") != new.get("config"):
+        print("warning: the runs used different settings, compare with care")
+    rows, regressions = compare(base, new, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for metric, old, value, change, flag in rows:
+        print(f"{metric:<{width}}  {old:>12g}  {value:>12g}  {change:>+8.1f}%  {flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
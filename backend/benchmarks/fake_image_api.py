@@ -0,0 +1,67 @@
+"""Local stand-in for the OpenAI image generation endpoint.
+
+Serves POST /v1/images/generations with a solid-colour PNG whose colour is derived
+from the prompt, after an artificial delay, so image throughput can be load-tested
+offline. Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8100/v1.
+
+    python -m benchmarks.fake_image_api --port 8100 --latency 2.0
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import struct
+import time
+import zlib
+
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+app = FastAPI(title="Fake image API")
+app.state.latency = 1.0
+
+
+class ImageRequest(BaseModel):
+    prompt: str
+    model: str = "dall-e-2"
+    size: str = "256x256"
+    n: int = 1
+    response_format: str = "b64_json"
+
+
+def make_png(width: int, height: int, rgb: bytes) -> bytes:
+    """Encode a solid-colour RGB image as PNG"""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    row = b"\x00" + rgb * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(row * height))
+        + chunk(b"IEND", b"")
+    )
+
+
+@app.post("/v1/images/generations")
+async def generate(request: ImageRequest):
+    await asyncio.sleep(app.state.latency)
+    width, height = (int(part) for part in request.size.split("x"))
+    rgb = hashlib.sha256(request.prompt.encode("utf-8")).digest()[:3]
+    image = base64.b64encode(make_png(width, height, rgb)).decode("ascii")
+    return {
+        "created": int(time.time()),
+        "data": [{"b64_json": image, "revised_prompt": request.prompt} for _ in range(request.n)]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds to wait before answering")
+    args = parser.parse_args()
+    app.state.latency = args.latency
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
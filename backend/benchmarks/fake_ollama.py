@@ -0,0 +1,136 @@
+"""Local stand-in for the Ollama chat and embedding API.
+
+Serves POST /api/chat (streamed or not) and POST /api/embed with deterministic
+output after configurable delays, so every RAGService path can be benchmarked
+offline. Point the app at it with OLLAMA_HOST=http://127.0.0.1:8110.
+
+Replies depend on the system prompt the app sends: relevance checks get "True",
+search query generation gets a few keywords, anything else gets a canned answer
+of --answer-tokens tokens streamed one by one. Embeddings are hashed bags of
+words, so texts sharing words are close to each other and retrieval stays
+meaningful.
+
+    python -m benchmarks.fake_ollama --port 8110 --first-token 0.2 --token-latency 0.01
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import re
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI(title="Fake Ollama")
+app.state.first_token = 0.2  # Seconds before the first token (prompt processing)
+app.state.token_latency = 0.01  # Seconds per generated token
+app.state.embed_latency = 0.005  # Seconds per embedded text
+app.state.answer_tokens = 120
+app.state.dimensions = 256
+
+ANSWER_WORDS = (
+    "Based on the provided context the answer covers the main points of the question and explains "
+    "how the relevant parts fit together with a short example and a summary at the end"
+).split()
+
+
+def reply_for(messages: list) -> str:
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    if "Respond only with \"True\" or \"False\"" in system:
+        return "True"
+    if "search query" in system.lower():
+        question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        words = re.findall(r"\w+", question.split(":", 1)[-1])
+        return " ".join(words[:4]) or "latest news"
+    count = app.state.answer_tokens
+    return " ".join(ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(count))
+
+
+def embed(text: str) -> list:
+    vector = [0.0] * app.state.dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % app.state.dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def timestamp() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime())
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    model = body.get("model", "fake")
+    text = reply_for(body.get("messages", []))
+    tokens = re.findall(r"\S+\s*", text) or [""]
+
+    def final(content: str, start: float) -> dict:
+        return {
+            "model": model,
+            "created_at": timestamp(),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "prompt_eval_count": 32,
+            "eval_count": len(tokens),
+        }
+
+    start = time.perf_counter()
+    if not body.get("stream", True):
+        await asyncio.sleep(app.state.first_token + app.state.token_latency * len(tokens))
+        return final(text, start)
+
+    async def stream():
+        await asyncio.sleep(app.state.first_token)
+        for token in tokens:
+            await asyncio.sleep(app.state.token_latency)
+            chunk = {"model": model, "created_at": timestamp(), "message": {"role": "assistant", "content": token}, "done": False}
+            yield json.dumps(chunk) + "\n"
+        yield json.dumps(final("", start)) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/api/embed")
+async def embed_texts(request: Request):
+    body = await request.json()
+    texts = body.get("input", [])
+    if isinstance(texts, str):
+        texts = [texts]
+    await asyncio.sleep(app.state.embed_latency * len(texts))
+    return {"model": body.get("model", "fake"), "embeddings": [embed(text) for text in texts]}
+
+
+@app.post("/api/embeddings")
+async def embed_legacy(request: Request):
+    body = await request.json()
+    await asyncio.sleep(app.state.embed_latency)
+    return {"embedding": embed(body.get("prompt", ""))}
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": []}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8110)
+    parser.add_argument("--first-token", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    args = parser.parse_args()
+    app.state.first_token = args.first_token
+    app.state.token_latency = args.token_latency
+    app.state.embed_latency = args.embed_latency
+    app.state.answer_tokens = args.answer_tokens
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,82 @@
+"""Local stand-in for DuckDuckGo's HTML search and the pages it links to.
+
+GET /html/?q=... returns a results page in DuckDuckGo's markup linking to
+--results fixture articles on the same host, and GET /pages/{n} serves those
+articles: deterministic paragraphs about the query, after a per-page delay.
+Point the app at it with SEARCH_URL=http://127.0.0.1:8120/html/.
+
+    python -m benchmarks.fake_web --port 8120 --search-latency 0.3 --page-latency 0.5
+"""
+import argparse
+import asyncio
+import html
+import random
+from urllib.parse import quote
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse
+
+app = FastAPI(title="Fake search and web host")
+app.state.search_latency = 0.3
+app.state.page_latency = 0.5
+app.state.results = 8
+app.state.paragraphs = 12
+
+FILLER = (
+    "Analysts said the figures released this week were in line with expectations. The report "
+    "covers the most recent quarter and compares it with the same period last year. Officials "
+    "noted that further details would be published in the coming weeks, and several experts "
+    "pointed to earlier studies that reached similar conclusions."
+).split(". ")
+
+
+@app.get("/html/", response_class=HTMLResponse)
+async def search(request: Request, q: str = ""):
+    await asyncio.sleep(app.state.search_latency)
+    base = str(request.base_url).rstrip("/")
+    results = "".join(
+        f"""
+        <div class="result results_links results_links_deep web-result">
+          <h2 class="result__title"><a class="result__a" href="{base}/pages/{n}?q={quote(q)}">{html.escape(q)} - source {n}</a></h2>
+          <a class="result__snippet" href="{base}/pages/{n}">Latest coverage of {html.escape(q)} from source {n}.</a>
+        </div>"""
+        for n in range(1, app.state.results + 1)
+    )
+    return f"<html><body><div id='links' class='results'>{results}</div></body></html>"
+
+
+@app.get("/pages/{n}", response_class=HTMLResponse)
+async def page(n: int, q: str = "the topic"):
+    await asyncio.sleep(app.state.page_latency)
+    rng = random.Random(f"{n}:{q}")
+    topic = html.escape(q)
+    paragraphs = "".join(
+        f"<p>{topic} update {i + 1} from source {n}: " + ". ".join(rng.sample(FILLER, len(FILLER))) + ".</p>"
+        for i in range(app.state.paragraphs)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><title>{topic} - source {n}</title></head>
+<body>
+  <nav><a href="/">Home</a> | <a href="/news">News</a></nav>
+  <article>
+    <h1>What we know about {topic}</h1>
+    <p class="byline">Published by Source {n}</p>
+    {paragraphs}
+  </article>
+  <footer>Copyright Source {n}</footer>
+</body></html>"""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8120)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--page-latency", type=float, default=0.5)
+    parser.add_argument("--results", type=int, default=8)
+    args = parser.parse_args()
+    app.state.search_latency = args.search_latency
+    app.state.page_latency = args.page_latency
+    app.state.results = args.results
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,68 @@
+"""Deterministic inputs for the offline benchmarks."""
+import random
+
+TOPICS = ["solar power", "battery chemistry", "grid storage", "wind turbines", "heat pumps",
+          "hydrogen fuel", "nuclear fusion", "carbon capture", "electric vehicles", "smart meters"]
+
+SENTENCES = [
+    "{topic} has seen rapid progress over the last decade as costs fell and efficiency improved.",
+    "Researchers measured the performance of {topic} under a range of operating conditions.",
+    "The results suggest that {topic} can be deployed at scale with modest changes to existing infrastructure.",
+    "Several pilot projects demonstrated that {topic} reduces operating costs for households and businesses.",
+    "Critics point out that the supply chain for {topic} still depends on a small number of manufacturers.",
+    "Policy support has been essential for the early adoption of {topic} in most markets.",
+    "A detailed comparison shows how {topic} performs relative to the alternatives over its lifetime.",
+]
+
+
+def document_pages(pages: int, lines_per_page: int = 40, seed: int = 0):
+    """Lines of text for each page of a synthetic report"""
+    rng = random.Random(seed)
+    result = []
+    for page in range(pages):
+        topic = TOPICS[page % len(TOPICS)]
+        lines = [f"Section {page + 1}: {topic.title()}"]
+        while len(lines) < lines_per_page:
+            lines.append(rng.choice(SENTENCES).format(topic=topic))
+        result.append(lines)
+    return result
+
+
+def escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages) -> bytes:
+    """Encode pages of text lines as a minimal PDF that PyPDFLoader can extract"""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # Filled in once the page tree exists
+    page_tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for lines in pages:
+        text = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({escape_pdf_text(line)}) '" for line in lines) + " ET"
+        stream = text.encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (page_tree, font, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode("ascii")
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(output)
@@ -0,0 +1,190 @@
+"""Replay a traffic capture against a server and report latency per endpoint.
+
+Reads the NDJSON written by the capture middleware (TRAFFIC_CAPTURE_ENABLED=true),
+rebuilds each request from its recorded shape (filler text of the same length,
+synthetic PDFs of about the same size, the same flags) and sends it on the
+recorded schedule divided by --speedup. Each captured conversation gets a fresh
+conversation on the target and its requests are sent in their original order;
+--concurrency caps the requests in flight across all of them.
+
+    python -m benchmarks.replay_traffic traffic_capture.ndjson --base-url http://127.0.0.1:8000 --speedup 4
+    python -m benchmarks.replay_traffic traffic_capture.ndjson --local --speedup 0 --concurrency 20
+
+--local starts the app in-process against the offline fakes (see bench_suite);
+--speedup 0 sends every request as soon as the one before it in its
+conversation has finished.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.bench_api_concurrency import login, percentile
+from benchmarks.fixtures import SENTENCES, TOPICS, document_pages, make_pdf
+
+PDF_PAGE_BYTES = len(make_pdf(document_pages(2))) - len(make_pdf(document_pages(1)))
+
+
+def load_capture(path: str) -> list:
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda record: record["ts"])
+
+
+def filler(length: int, seed: int = 0) -> str:
+    text, i = "", seed
+    while len(text) < length:
+        text += SENTENCES[i % len(SENTENCES)].format(topic=TOPICS[i % len(TOPICS)]) + " "
+        i += 1
+    return text[:length]
+
+
+def rebuild(value, seed: int = 0):
+    """Inverse of the capture's sanitize: lengths become filler text"""
+    if isinstance(value, dict):
+        if set(value) == {"$chars"}:
+            return filler(value["$chars"], seed)
+        return {key: rebuild(item, seed) for key, item in value.items()}
+    if isinstance(value, list):
+        return [rebuild(item, seed) for item in value]
+    return value
+
+
+def synthetic_file(shape: dict, seed: int):
+    extension = shape.get("extension") or ".pdf"
+    if extension == ".pdf":
+        content = make_pdf(document_pages(max(1, shape["bytes"] // PDF_PAGE_BYTES), seed=seed))
+    else:
+        content = filler(shape["bytes"], seed).encode("utf-8")
+    return (f"replay_{seed}{extension}", content, shape.get("content_type") or "application/octet-stream")
+
+
+def build_request(record: dict, conversation_id: int, seed: int) -> dict:
+    path = record["route"].replace("{conversation_id}", str(conversation_id))
+    # Cursors from the original server mean nothing here, only numeric parameters are replayed
+    params = {key: value for key, value in (record.get("query") or {}).items() if isinstance(value, int)}
+    request = {"method": record["method"], "url": path, "params": params}
+    body = record.get("body") or {}
+    if "json" in body:
+        request["json"] = rebuild(body["json"], seed)
+    elif "form" in body:
+        request["data"] = {
+            name: str(conversation_id) if name == "conversation_id" else rebuild(value, seed)
+            for name, value in body["form"].items()
+        }
+        request["files"] = [(shape["name"], synthetic_file(shape, seed)) for shape in body.get("files", [])]
+    elif "$bytes" in body:
+        request["content"] = filler(body["$bytes"], seed).encode("utf-8")
+    return request
+
+
+async def replay(base_url: str, records: list, speedup: float, concurrency: int, email: str, password: str, timeout: float) -> dict:
+    by_conversation = defaultdict(list)
+    for record in records:
+        by_conversation[record.get("conversation")].append(record)
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    recorded = defaultdict(list)
+    lag = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        headers = await login(client, email, password)
+
+        # Target conversations are created up front, outside the measured schedule
+        conversation_ids = {}
+        for key in by_conversation:
+            response = await client.post("/api/conversations", json={"title": f"Replay {key}"}, headers=headers)
+            response.raise_for_status()
+            conversation_ids[key] = response.json()["id"]
+
+        first = records[0]["ts"]
+        start = time.perf_counter()
+
+        async def conversation_loop(key, items):
+            for seed, record in enumerate(items):
+                if speedup > 0:
+                    due = start + (record["ts"] - first) / speedup
+                    await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                    lag.append(max(0.0, time.perf_counter() - due))
+                endpoint = f"{record['method']} {record['route']}"
+                recorded[endpoint].append(record["duration_ms"] / 1000)
+                request = build_request(record, conversation_ids[key], seed)
+                async with semaphore:
+                    sent = time.perf_counter()
+                    try:
+                        response = await client.request(headers=headers, **request)
+                        if response.status_code >= 400:
+                            errors[endpoint] += 1
+                    except httpx.HTTPError:
+                        errors[endpoint] += 1
+                    latencies[endpoint].append(time.perf_counter() - sent)
+
+        await asyncio.gather(*(conversation_loop(key, items) for key, items in by_conversation.items()))
+        elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for endpoint, values in sorted(latencies.items()):
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": errors[endpoint],
+            "error_rate": round(errors[endpoint] / len(values), 4),
+            "p50_ms": round(statistics.median(values) * 1000, 1),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+            "recorded_p50_ms": round(statistics.median(recorded[endpoint]) * 1000, 1),
+        }
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "requests": total,
+        "conversations": len(by_conversation),
+        "elapsed_s": round(elapsed, 2),
+        "requests_per_s": round(total / elapsed, 1),
+        "captured_span_s": round(records[-1]["ts"] - first, 2),
+        # How far behind schedule requests went out, high values mean the target (or --concurrency) is the bottleneck
+        "schedule_lag_p95_ms": round(percentile(lag, 0.95) * 1000, 1) if lag else None,
+        "endpoints": endpoints,
+    }
+
+
+def main():
+    from benchmarks.bench_suite import add_fake_arguments, start_offline_app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--local", action="store_true", help="replay against an in-process app and the offline fakes")
+    parser.add_argument("--speedup", type=float, default=1.0, help="divide the recorded gaps by this, 0 sends back to back")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--email", default="test@example.com")
+    parser.add_argument("--password", default="test123")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="also write the report to this JSON file")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    records = load_capture(args.capture)
+    if not records:
+        sys.exit(f"{args.capture} has no captured requests")
+    base_url = start_offline_app(args)[0] if args.local else args.base_url
+    report = asyncio.run(replay(base_url, records, args.speedup, args.concurrency, args.email, args.password, args.timeout))
+
+    print(f"{report['requests']} requests in {report['elapsed_s']}s ({report['requests_per_s']} req/s), "
+          f"schedule lag p95 {report['schedule_lag_p95_ms']} ms")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"  {endpoint:<50} n={stats['requests']:<5} errors={stats['error_rate']:.1%}  "
+              f"p50={stats['p50_ms']:.0f}ms p95={stats['p95_ms']:.0f}ms p99={stats['p99_ms']:.0f}ms  "
+              f"(recorded p50 {stats['recorded_p50_ms']:.0f}ms)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
+import sys
 import uvicorn
 from app.main import app
+from app.core.config import settings
+from app.core.file_lock import cross_process_locking
 from app.db.session import SessionLocal
 from app.db.init_db import init_db
 
@@ -10,4 +13,10 @@ if __name__ == "__main__":
     db.close()
     
     # Run the server
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    if settings.WORKERS > 1:
+        # Workers coordinate vector store writes with file locks, which need fcntl
+        if not cross_process_locking():
+            sys.exit("WORKERS > 1 is not supported on this platform, run a single worker")
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, workers=settings.WORKERS)
+    else:
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
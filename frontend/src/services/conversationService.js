@@ -3,8 +3,17 @@ import api from './api';
 export const conversationService = {
   async getConversations() {
     try {
-      const response = await api.get('/conversations');
-      return response.data;
+      // Walk the lightweight summary pages instead of loading every message of every conversation
+      const conversations = [];
+      let cursor = null;
+      do {
+        const response = await api.get('/conversations/summary', {
+          params: { limit: 200, cursor: cursor || undefined }
+        });
+        conversations.push(...response.data.items);
+        cursor = response.data.next_cursor;
+      } while (cursor);
+      return conversations;
     } catch (error) {
       console.error('Failed to fetch conversations:', error);
       throw this.handleError(error);
@@ -21,6 +30,19 @@ export const conversationService = {
     }
   },
 
+  async getMessages(id, cursor = null) {
+    try {
+      // One page, newest messages first, returned oldest first; next_cursor pages further back
+      const response = await api.get(`/conversations/${id}/messages`, {
+        params: { limit: 50, cursor: cursor || undefined }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Failed to fetch messages:', error);
+      throw this.handleError(error);
+    }
+  },
+
   async createConversation(title) {
     try {
       const response = await api.post('/conversations', { title });
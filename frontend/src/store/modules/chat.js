@@ -56,9 +56,20 @@ export default {
         const conversationInList = state.conversations.find(c => c.id === conversationId);
         if (conversationInList) {
           conversationInList.updated_at = new Date().toISOString();
+          // Generated images come with a thumbnail for the list
+          const thumbnail = message.role === 'assistant' && message.content?.match(/data-thumbnail="([^"]+)"/);
+          if (thumbnail) {
+            conversationInList.thumbnail_url = thumbnail[1];
+          }
         }
       }
     },
+    PREPEND_MESSAGES(state, { conversationId, messages, cursor }) {
+      if (state.currentConversation?.id === conversationId) {
+        state.currentConversation.messages = [...messages, ...state.currentConversation.messages];
+        state.currentConversation.messagesCursor = cursor;
+      }
+    },
     REMOVE_MESSAGE(state, { conversationId, messageId }) {
       if (state.currentConversation?.id === conversationId) {
         state.currentConversation.messages = state.currentConversation.messages.filter(
@@ -82,7 +93,13 @@ export default {
     },
     async loadConversation({ commit }, conversationId) {
       try {
-        const conversation = await conversationService.getConversation(conversationId);
+        // Only the latest page of messages, older ones are loaded when scrolling up
+        const [conversation, page] = await Promise.all([
+          conversationService.getConversation(conversationId),
+          conversationService.getMessages(conversationId)
+        ]);
+        conversation.messages = page.items;
+        conversation.messagesCursor = page.next_cursor;
         commit('SET_CURRENT_CONVERSATION', conversation);
         return conversation;
       } catch (error) {
@@ -90,6 +107,22 @@ export default {
         throw error;
       }
     },
+    async loadOlderMessages({ commit, state }) {
+      const conversation = state.currentConversation;
+      if (!conversation?.messagesCursor) return false;
+      try {
+        const page = await conversationService.getMessages(conversation.id, conversation.messagesCursor);
+        commit('PREPEND_MESSAGES', {
+          conversationId: conversation.id,
+          messages: page.items,
+          cursor: page.next_cursor
+        });
+        return true;
+      } catch (error) {
+        console.error('Error loading older messages:', error);
+        throw error;
+      }
+    },
     async createConversation({ commit }, title) {
       try {
         const conversation = await conversationService.createConversation(title);